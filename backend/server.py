@@ -1,15 +1,41 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Query, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 import os
+import asyncio
+import base64
+import codecs
+import hashlib
+import httpx
+import heapq
+import json
 import logging
+import random
+import re
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import islice
+from contextvars import ContextVar
+from uuid import uuid4
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+import numpy as np
+import orjson
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional, Dict, Any, Set, Tuple, AsyncIterator, Iterable, Iterator
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from bson import ObjectId
 from dateutil.rrule import rrule, DAILY, WEEKLY, MONTHLY, YEARLY
+from dateutil.relativedelta import relativedelta
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -19,6 +45,63 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Indexes backing the date-range queries in get_events and the updated_at scan in get_changes
+EVENT_INDEXES = [
+    IndexModel([("effective_end", ASCENDING), ("effective_start", ASCENDING)], name="effective_end_effective_start"),
+    IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    IndexModel([("ics_uid", ASCENDING)], name="ics_uid", sparse=True),
+]
+# Indexes earlier range queries used; range_query only reads effective_start/effective_end now,
+# so existing deployments drop these at startup instead of paying for them on every write
+OBSOLETE_EVENT_INDEXES = ["start_date_end_date", "end_date_start_date", "effective_end_start_date"]
+
+# Deleted event ids are kept as tombstones for delta sync, and expire after this many days;
+# older sync tokens have to fall back to a full sync
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get("TOMBSTONE_RETENTION_DAYS", "90"))
+# How late a write may commit after stamping its updated_at (including clock skew between
+# server processes) and still be picked up by delta sync
+SYNC_TOKEN_LAG = timedelta(seconds=float(os.environ.get("SYNC_TOKEN_LAG_SECONDS", "10")))
+TOMBSTONE_INDEXES = [
+    IndexModel([("deleted_at", ASCENDING)], name="deleted_at"),
+    IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+]
+
+RECURRING_TYPES = ["daily", "weekly", "monthly", "yearly"]
+RECURRENCE_FREQUENCIES = {
+    "daily": DAILY,
+    "weekly": WEEKLY,
+    "monthly": MONTHLY,
+    "yearly": YEARLY
+}
+
+# Recurrence debug tracing: enable with RECURRENCE_LOG_LEVEL=DEBUG, and trace only a
+# DEBUG_SAMPLE_RATE fraction of requests. Untraced requests skip all debug formatting.
+recurrence_logger = logging.getLogger("server.recurrence")
+recurrence_logger.setLevel(os.environ.get("RECURRENCE_LOG_LEVEL", "INFO").upper())
+DEBUG_SAMPLE_RATE = float(os.environ.get("DEBUG_SAMPLE_RATE", "1.0"))
+debug_trace_id: ContextVar[Optional[str]] = ContextVar("debug_trace_id", default=None)
+
+class DebugSamplingMiddleware:
+    """Pick the requests whose recurrence expansion gets traced at DEBUG level"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http"
+                or not recurrence_logger.isEnabledFor(logging.DEBUG)
+                or random.random() >= DEBUG_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+        
+        trace_id = uuid4().hex[:12]
+        token = debug_trace_id.set(trace_id)
+        recurrence_logger.debug("request trace=%s method=%s path=%s", trace_id, scope["method"], scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            debug_trace_id.reset(token)
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -44,9 +127,13 @@ class PyObjectId(ObjectId):
 # Define Models
 class RecurrenceRule(BaseModel):
     type: str  # 'none', 'daily', 'weekly', 'monthly', 'yearly'
-    interval: int = 1  # Every X days/weeks/months/years
+    interval: int = Field(1, ge=1)  # Every X days/weeks/months/years
     end_date: Optional[str] = None
-    days_of_week: Optional[List[int]] = None  # For weekly: 0=Mon, 6=Sun
+    days_of_week: Optional[List[int]] = None  # 0=Mon, 6=Sun; monthly/yearly only with by_month_day or by_set_pos
+    count: Optional[int] = Field(None, ge=1, le=10000)  # Stop after this many occurrences
+    by_month_day: Optional[List[int]] = None  # Days of the month, negative from the end
+    by_set_pos: Optional[List[int]] = None  # Pick the nth day(s) of each period, e.g. -1 for the last
+    last_occurrence: Optional[str] = None  # Derived on write for count rules, not set by clients
 
 class Reminder(BaseModel):
     minutes_before: int
@@ -69,6 +156,10 @@ class Event(BaseModel):
     updated_at: Optional[str] = None
     is_recurring_instance: Optional[bool] = False
     original_event_id: Optional[str] = None
+    exdates: List[str] = []  # Original starts of cancelled occurrences
+    overrides: Dict[str, Dict[str, Any]] = {}  # Original start -> fields changed on that occurrence
+    original_start_date: Optional[str] = None  # Set on an overridden occurrence
+    tzid: Optional[str] = None  # IANA zone; dates are then wall-clock times there, kept across DST
 
     class Config:
         populate_by_name = True
@@ -86,6 +177,12 @@ class EventCreate(BaseModel):
     recurrence: Optional[RecurrenceRule] = None
     reminders: List[Reminder] = []
     guests: List[str] = []
+    tzid: Optional[str] = None
+
+    @field_validator("tzid")
+    @classmethod
+    def known_tzid(cls, value: Optional[str]) -> Optional[str]:
+        return checked_tzid(value)
 
 class EventUpdate(BaseModel):
     title: Optional[str] = None
@@ -99,6 +196,24 @@ class EventUpdate(BaseModel):
     recurrence: Optional[RecurrenceRule] = None
     reminders: Optional[List[Reminder]] = None
     guests: Optional[List[str]] = None
+    tzid: Optional[str] = None
+
+    @field_validator("tzid")
+    @classmethod
+    def known_tzid(cls, value: Optional[str]) -> Optional[str]:
+        return checked_tzid(value)
+
+class EventBulkUpdate(EventUpdate):
+    id: str
+
+class EventBulkDelete(BaseModel):
+    ids: List[str]
+
+class BulkResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    status: str  # 'created', 'updated', 'deleted', 'not_found', 'error'
+    error: Optional[str] = None
 
 # Utility functions
 def event_helper(event) -> dict:
@@ -119,152 +234,1795 @@ def event_helper(event) -> dict:
         "updated_at": event.get("updated_at"),
         "is_recurring_instance": event.get("is_recurring_instance", False),
         "original_event_id": event.get("original_event_id"),
+        "exdates": event.get("exdates", []),
+        "overrides": event.get("overrides", {}),
+        "original_start_date": event.get("original_start_date"),
+        "tzid": event.get("tzid"),
     }
 
-def expand_recurring_events(event: dict, start_date: datetime, end_date: datetime) -> List[dict]:
-    """Expand a recurring event into individual occurrences within the date range"""
-    print(f"DEBUG: Expanding event {event.get('_id')} with recurrence {event.get('recurrence')}")
-    
-    if not event.get("recurrence") or event["recurrence"].get("type") == "none":
-        print("DEBUG: No recurrence, returning original event")
-        return [event]
-    
+@lru_cache(maxsize=4096)
+def parse_iso(value: str) -> datetime:
+    """Parse a stored/query ISO date string once; series dates repeat across requests"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+# Pads wall-clock windows; larger than any DST or offset change a zone has made
+MAX_ZONE_SHIFT = timedelta(hours=3)
+
+@lru_cache(maxsize=None)
+def get_zone(tzid: str) -> ZoneInfo:
+    """Resolve an IANA zone name once per process; ValueError for unknown names"""
+    try:
+        return ZoneInfo(tzid)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone {tzid!r}")
+
+def checked_tzid(tzid: Optional[str]) -> Optional[str]:
+    if tzid is not None:
+        get_zone(tzid)
+    return tzid
+
+@lru_cache(maxsize=4096)
+def zone_year_transitions(tzid: str, year: int) -> Tuple[Tuple[datetime, timedelta, timedelta], ...]:
+    """(naive UTC instant, offset before, offset after) of each offset change in a year.
+
+    zoneinfo keeps its transition list private, so the offset is probed at every UTC midnight
+    and each change bisected to the second; it is worked out once per zone and year.
+    """
+    zone = get_zone(tzid)
+
+    def offset(moment: datetime) -> timedelta:
+        return moment.replace(tzinfo=timezone.utc).astimezone(zone).utcoffset()
+
+    transitions = []
+    day = datetime(year, 1, 1)
+    before = offset(day)
+    while day.year == year:
+        next_day = day + timedelta(days=1)
+        after = offset(next_day)
+        if after != before:
+            low, high = day, next_day
+            while high - low > timedelta(seconds=1):
+                middle = low + timedelta(seconds=(high - low).total_seconds() // 2)
+                low, high = (middle, high) if offset(middle) == before else (low, middle)
+            transitions.append((high, before, after))
+        day, before = next_day, after
+    return tuple(transitions)
+
+@lru_cache(maxsize=1024)
+def zone_offset_table(tzid: str, first_year: int,
+                      last_year: int) -> Tuple[List[datetime], List[datetime], List[timedelta], List[timezone]]:
+    """(UTC change instants, wall-clock switch points, offsets, fixed zones) over whole years.
+
+    offsets[i] applies before change i and offsets[-1] after the last. A wall-clock time only
+    takes the next offset once it is past both readings of the change, so a time in a
+    spring-forward gap keeps the earlier offset (and is pushed forward by the gap) and a
+    repeated time resolves to its first instance, as RFC 5545 and zoneinfo's fold=0 do.
+    """
+    transitions = [t for year in range(first_year, last_year + 1) for t in zone_year_transitions(tzid, year)]
+    initial = datetime(first_year, 1, 1, tzinfo=timezone.utc).astimezone(get_zone(tzid)).utcoffset()
+    offsets = [initial] + [after for _, _, after in transitions]
+    return ([moment for moment, _, _ in transitions],
+            [moment + max(before, after) for moment, before, after in transitions],
+            offsets, [timezone(offset) for offset in offsets])
+
+def localize_wall_times(walls: List[datetime], tzid: str) -> List[datetime]:
+    """Fixed-offset datetimes for naive wall-clock times in a zone.
+
+    Each time costs two bisects over the cached transition table of the years involved,
+    however many DST changes the times span.
+    """
+    if not walls:
+        return []
+    earliest, latest = min(walls), max(walls)
+    instants, switches, offsets, zones = zone_offset_table(tzid, earliest.year - 1, latest.year + 1)
+    used = bisect_right(switches, earliest)
+    if bisect_right(switches, latest) == used == bisect_right(instants, latest - offsets[used]):
+        return [wall.replace(tzinfo=zones[used]) for wall in walls]  # no change in between
+    localized = []
+    for wall in walls:
+        used = bisect_right(switches, wall)
+        actual = bisect_right(instants, wall - offsets[used])
+        if actual != used:  # inside a gap
+            wall += offsets[actual] - offsets[used]
+        localized.append(wall.replace(tzinfo=zones[actual]))
+    return localized
+
+def to_wall_clock(value: datetime, tzid: str) -> datetime:
+    """Naive wall-clock time in a zone; naive values already are one"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(get_zone(tzid)).replace(tzinfo=None)
+
+def wall_clock_view(event: dict) -> dict:
+    """An event with a tzid as a floating one: its dates as naive wall-clock times, no tzid.
+
+    The existing naive expansion then steps in wall-clock time, so occurrences stay at the
+    same local time across DST; callers localize what it yields.
+    """
+    tzid = event["tzid"]
+
+    def wall(value: Optional[str]) -> Optional[str]:
+        return value and to_wall_clock(parse_iso(value), tzid).isoformat()
+
+    view = {k: v for k, v in event.items() if k != "tzid"}
+    view["start_date"] = wall(event["start_date"])
+    view["end_date"] = wall(event.get("end_date"))
+    recurrence = event.get("recurrence")
+    if recurrence:
+        view["recurrence"] = dict(recurrence, end_date=wall(recurrence.get("end_date")),
+                                  last_occurrence=wall(recurrence.get("last_occurrence")))
+    if event.get("overrides"):
+        view["overrides"] = {key: dict(override, **{field: wall(override[field]) for field in ("start_date", "end_date")
+                                                    if override.get(field)})
+                             for key, override in event["overrides"].items()}
+    return view
+
+def series_is_aware(event: dict) -> bool:
+    """Whether an event's occurrences come out offset-aware (it has a tzid or an offset)"""
+    return bool(event.get("tzid")) or parse_iso(event["start_date"]).tzinfo is not None
+
+def align_to_series(event: dict, *moments: datetime) -> Tuple[datetime, ...]:
+    """Query bounds comparable with an event's occurrences: naive bounds are read as UTC for
+    aware series, aware bounds become naive UTC for floating ones"""
+    if series_is_aware(event):
+        return tuple(m if m.tzinfo is not None else m.replace(tzinfo=timezone.utc) for m in moments)
+    return tuple(to_utc_naive(m) for m in moments)
+
+def series_start(event: dict) -> datetime:
+    """Start of the event itself, localized when it has a tzid"""
+    start = parse_iso(event["start_date"])
+    if event.get("tzid") and start.tzinfo is None:
+        return localize_wall_times([start], event["tzid"])[0]
+    return start
+
+def series_end(event: dict) -> Optional[datetime]:
+    if not event.get("end_date"):
+        return None
+    end = parse_iso(event["end_date"])
+    if event.get("tzid") and end.tzinfo is None:
+        return localize_wall_times([end], event["tzid"])[0]
+    return end
+
+def wall_start(event: dict) -> datetime:
+    """Series start as the recurrence rule sees it: wall-clock time in the event's tzid, if any"""
+    start = parse_iso(event["start_date"])
+    return to_wall_clock(start, event["tzid"]) if event.get("tzid") else start
+
+def seek_recurrence_start(freq: int, dtstart: datetime, interval: int, window_start: datetime) -> datetime:
+    """Move dtstart forward by whole recurrence periods to the last period start at or before window_start.
+
+    Shifting by a multiple of the interval keeps the rule's phase, so the rrule built
+    from the returned dtstart yields exactly the original occurrences from that point on.
+    """
+    if window_start <= dtstart:
+        return dtstart
+
+    if freq in (DAILY, WEEKLY):
+        period = timedelta(days=interval) if freq == DAILY else timedelta(weeks=interval)
+        return dtstart + period * ((window_start - dtstart) // period)
+
+    # Monthly/yearly: step whole periods of months, backing off when the target month
+    # has no such day (e.g. the 31st or Feb 29), because rrule skips those months anyway.
+    months = interval if freq == MONTHLY else interval * 12
+    elapsed = (window_start.year - dtstart.year) * 12 + window_start.month - dtstart.month
+    periods = elapsed // months
+    while periods > 0:
+        candidate = dtstart + relativedelta(months=periods * months)
+        if candidate.day == dtstart.day and candidate <= window_start:
+            return candidate
+        periods -= 1
+    return dtstart
+
+def recurrence_params(event: dict, event_start: datetime, start_date: datetime, end_date: datetime) -> Optional[dict]:
+    """rrule keyword arguments for a recurring event, seeked to the window; None for an unknown type"""
     recurrence = event["recurrence"]
-    event_start = datetime.fromisoformat(event["start_date"].replace('Z', '+00:00'))
     
     # Determine recurrence rule
-    freq_map = {
-        "daily": DAILY,
-        "weekly": WEEKLY,
-        "monthly": MONTHLY,
-        "yearly": YEARLY
-    }
+    freq = RECURRENCE_FREQUENCIES.get(recurrence["type"])
+    if freq is None:  # YEARLY is 0, so test for a missing mapping explicitly
+        return None
     
-    freq = freq_map.get(recurrence["type"])
-    if not freq:
-        print(f"DEBUG: Unknown frequency {recurrence['type']}")
-        return [event]
-    
-    # Set up rrule parameters
+    # Set up rrule parameters, starting from the period that contains the query start
+    # so old series don't walk through years of occurrences before the window
+    interval = recurrence.get("interval", 1)
+    if interval < 1:  # rejected on write; a stored one reads as a single event, not a crash
+        return None
     rrule_params = {
         "freq": freq,
-        "dtstart": event_start,
-        "interval": recurrence.get("interval", 1)
+        "dtstart": seek_recurrence_start(freq, event_start, interval, start_date),
+        "interval": interval
     }
     
-    # Add end date if specified
+    # Add end date if specified, never iterating past the end of the query. A count rule
+    # ends at its precomputed last occurrence, which keeps seeking valid (counting from
+    # the seeked dtstart would be wrong).
+    rrule_params["until"] = end_date
     if recurrence.get("end_date"):
-        rrule_params["until"] = datetime.fromisoformat(recurrence["end_date"].replace('Z', '+00:00'))
+        rrule_params["until"] = min(parse_iso(recurrence["end_date"]), end_date)
+    if recurrence.get("count"):
+        last_occurrence = recurrence.get("last_occurrence") or count_last_occurrence(event_start, recurrence)
+        rrule_params["until"] = min(parse_iso(last_occurrence), rrule_params["until"])
+    
+    rrule_params.update(rule_by_parts(recurrence))
+    return rrule_params
+
+def rule_by_parts(recurrence: dict) -> dict:
+    """rrule by-rule arguments of a stored rule.
+
+    Weekday sets always apply to weekly rules. Monthly and yearly rules have always ignored
+    them, so there they only count alongside by_month_day or by_set_pos ("last Friday").
+    """
+    parts = {}
+    if recurrence.get("days_of_week") and (
+            recurrence["type"] == "weekly"
+            or (recurrence["type"] in ("monthly", "yearly") and (recurrence.get("by_month_day") or recurrence.get("by_set_pos")))):
+        parts["byweekday"] = recurrence["days_of_week"]
+    if recurrence.get("by_month_day"):
+        parts["bymonthday"] = recurrence["by_month_day"]
+    if recurrence.get("by_set_pos"):
+        parts["bysetpos"] = recurrence["by_set_pos"]
+    return parts
+
+def count_last_occurrence(event_start: datetime, recurrence: dict) -> str:
+    """Start of the last occurrence of a count rule, walking it from the series start once"""
+    rrule_params = {"freq": RECURRENCE_FREQUENCIES[recurrence["type"]], "dtstart": event_start,
+                    "interval": recurrence.get("interval", 1), "count": recurrence["count"],
+                    **rule_by_parts(recurrence)}
+    last = None
+    for last in rrule(**rrule_params):
+        pass
+    # A rule that never occurs ends before it starts
+    return (last or event_start - timedelta(microseconds=1)).isoformat()
+
+def checked_recurrence(recurrence: Optional[dict], series_start: Optional[datetime]) -> Optional[dict]:
+    """A rule about to be written, validated and with its derived fields filled in.
+
+    The last occurrence of a count rule needs the series start; without one it is left unset
+    (and computed on the fly) until the caller can supply it. Raises ValueError for a rule
+    dateutil rejects, e.g. out-of-range by-rule values.
+    """
+    if not recurrence or recurrence.get("type") not in RECURRING_TYPES:
+        return recurrence
+    if recurrence.get("interval", 1) < 1:
+        raise ValueError("interval must be at least 1")
+    if recurrence.get("count") and recurrence.get("end_date"):
+        # RFC 5545 allows UNTIL or COUNT, not both, and ics_rrule exports whichever is set
+        raise ValueError("count and end_date can't both be set")
+    for field, low, high in (("days_of_week", 0, 6), ("by_month_day", -31, 31), ("by_set_pos", -366, 366)):
+        values = recurrence.get(field) or []
+        if any(not low <= value <= high or (value == 0 and field != "days_of_week") for value in values):
+            raise ValueError(f"{field} values must be within {low}..{high}" + ("" if low == 0 else ", excluding 0"))
+    recurrence = dict(recurrence, last_occurrence=None)
+    if recurrence.get("count") and series_start is not None:
+        recurrence["last_occurrence"] = count_last_occurrence(series_start, recurrence)
     else:
-        # Limit to end_date of query
-        rrule_params["until"] = end_date
+        rrule(freq=RECURRENCE_FREQUENCIES[recurrence["type"]], dtstart=series_start or datetime(2000, 1, 1),
+              interval=recurrence.get("interval", 1), count=1, **rule_by_parts(recurrence))
+    return recurrence
+
+def fixed_recurrence_step(rrule_params: dict) -> Optional[timedelta]:
+    """Constant gap between occurrences, or None when the rule needs dateutil (months, by-rules)"""
+    if any(key.startswith("by") for key in rrule_params):
+        return None
+    if rrule_params["freq"] == DAILY:
+        return timedelta(days=rrule_params["interval"])
+    if rrule_params["freq"] == WEEKLY:
+        return timedelta(weeks=rrule_params["interval"])
+    return None
+
+# Fixed-gap starts are built in NumPy chunks that double from the first size up to the
+# last, so a short page stays cheap however wide the window and long walks amortize well
+RECURRENCE_CHUNK_SIZES = (16, 1024)
+
+def recurrence_starts(rrule_params: dict, start_date: datetime, end_date: datetime) -> Iterator[datetime]:
+    """Lazily yield the occurrence starts of a seeked rule inside [start_date, end_date], in order.
+
+    Fixed-gap rules are an arithmetic progression, so they are computed and clipped as
+    datetime64 arrays, chunk by chunk, and only the survivors become datetimes; anything
+    else iterates rrule.
+    """
+    step = fixed_recurrence_step(rrule_params)
+    if step is None or rrule_params["interval"] < 1:
+        yield from (d for d in rrule(**rrule_params) if start_date <= d <= end_date)
+        return
+    
+    # rrule drops sub-second precision from dtstart and steps in wall-clock time
+    dtstart = rrule_params["dtstart"].replace(microsecond=0)
+    last = min(rrule_params["until"], end_date)
+    if last < dtstart or last < start_date:
+        return
+    first_index = max(0, -((dtstart - start_date) // step))
+    last_index = (last - dtstart) // step
+    
+    step_us = step // timedelta(microseconds=1)
+    base = np.datetime64(dtstart.replace(tzinfo=None), "us")
+    chunk_size, max_chunk_size = RECURRENCE_CHUNK_SIZES
+    while first_index <= last_index:
+        chunk_end = min(first_index + chunk_size, last_index + 1)
+        offsets = np.arange(first_index, chunk_end, dtype=np.int64) * step_us
+        starts = (base + offsets.astype("timedelta64[us]")).tolist()
+        if dtstart.tzinfo is None:
+            yield from starts
+        else:
+            yield from (d.replace(tzinfo=dtstart.tzinfo) for d in starts)
+        first_index, chunk_size = chunk_end, min(chunk_size * 2, max_chunk_size)
+
+EXCEPTION_INDEX_CACHE_SIZE = 1024
+_exception_indexes: "OrderedDict[Tuple[str, str], Tuple[Set[str], Set[str], List[datetime], List[tuple]]]" = OrderedDict()
+
+def exception_index(event: dict) -> Tuple[Set[str], Set[str], List[datetime], List[Tuple[datetime, str, dict]]]:
+    """(cancelled keys, moved keys, new starts, moved instances) of a series, the last two sorted by new start.
+
+    Every exception write bumps updated_at, so this is built once per (series id, updated_at)
+    and a window then only costs a bisect, however many exceptions the series has collected.
+    """
+    cache_key = (str(event["_id"]), event["updated_at"]) if "_id" in event and event.get("updated_at") else None
+    cached = _exception_indexes.get(cache_key) if cache_key else None
+    if cached is not None:
+        _exception_indexes.move_to_end(cache_key)
+        return cached
+    
+    skipped = set(event.get("exdates") or ())
+    overrides = event.get("overrides") or {}
+    moved = sorted((parse_iso(o["start_date"]), key, o) for key, o in overrides.items()
+                   if o.get("start_date") and key not in skipped)
+    index = (skipped, {key for _, key, _ in moved}, [new_start for new_start, _, _ in moved], moved)
+    if cache_key:
+        _exception_indexes[cache_key] = index
+        if len(_exception_indexes) > EXCEPTION_INDEX_CACHE_SIZE:
+            _exception_indexes.popitem(last=False)
+    return index
+
+def apply_exceptions(event: dict, starts: Iterable[datetime], start_date: datetime,
+                     end_date: datetime) -> Iterator[Tuple[datetime, Optional[str], Optional[dict]]]:
+    """(start, original start, override) for a series' occurrences in the window, in start order.
+
+    Cancelled dates are dropped with a set lookup and overrides found with a dict lookup per
+    occurrence; moved instances are bisected out of the series' exception index and slotted
+    in at their new start. Series without exceptions pass straight through with no original
+    start or override.
+    """
+    overrides = event.get("overrides") or {}
+    if not event.get("exdates") and not overrides:
+        for occurrence_date in starts:
+            yield occurrence_date, None, None
+        return
     
-    # Add days of week for weekly recurrence
-    if recurrence["type"] == "weekly" and recurrence.get("days_of_week"):
-        rrule_params["byweekday"] = recurrence["days_of_week"]
+    skipped, moved, moved_starts, moved_instances = exception_index(event)
+    moved_in = moved_instances[bisect_left(moved_starts, start_date):bisect_right(moved_starts, end_date)]
     
-    print(f"DEBUG: rrule params: {rrule_params}")
+    def in_place():
+        for occurrence_date in starts:
+            key = occurrence_date.isoformat()
+            if key not in skipped and key not in moved:
+                yield occurrence_date, key, overrides.get(key)
     
-    # Generate occurrences
-    occurrences = []
+    yield from heapq.merge(in_place(), moved_in, key=lambda item: item[0])
+
+def iter_occurrences(event: dict, start_date: datetime,
+                     end_date: datetime) -> Iterator[Tuple[datetime, Optional[str], Optional[dict]]]:
+    """apply_exceptions over any event; one-off events yield themselves as-is whatever the window"""
+    start_date, end_date = align_to_series(event, start_date, end_date)
+    if event.get("tzid"):
+        yield from iter_zoned_occurrences(event, start_date, end_date)
+        return
+    event_start = parse_iso(event["start_date"])
+    if not event.get("recurrence") or event["recurrence"].get("type") == "none":
+        yield event_start, None, None
+        return
+    rrule_params = recurrence_params(event, event_start, start_date, end_date)
+    if rrule_params is None:
+        yield event_start, None, None
+        return
+    yield from apply_exceptions(event, recurrence_starts(rrule_params, start_date, end_date), start_date, end_date)
+
+def iter_zoned_occurrences(event: dict, start_date: datetime,
+                           end_date: datetime) -> Iterator[Tuple[datetime, Optional[str], Optional[dict]]]:
+    """iter_occurrences for an event with a tzid, over an aware window.
+
+    The rule runs lazily in wall-clock time over the window as read on the zone's clocks
+    (padded for offset changes inside it), and its starts are localized a chunk at a time.
+    Exception keys stay wall-clock times; override dates come back localized.
+    """
+    tzid = event["tzid"]
+    view = wall_clock_view(event)
+    if RECURRENCE_FREQUENCIES.get((view.get("recurrence") or {}).get("type")) is None:
+        yield series_start(event), None, None
+        return
+    wall_window = (to_wall_clock(start_date, tzid) - MAX_ZONE_SHIFT, to_wall_clock(end_date, tzid) + MAX_ZONE_SHIFT)
+    occurrences = iter_occurrences(view, *wall_window)
+    chunk_size, max_chunk_size = RECURRENCE_CHUNK_SIZES
+    while True:
+        chunk = list(islice(occurrences, chunk_size))
+        if not chunk:
+            return
+        chunk_size = min(chunk_size * 2, max_chunk_size)
+        starts = localize_wall_times([occurrence_start for occurrence_start, _, _ in chunk], tzid)
+        # Wall-clock order is instant order, except for two starts inside one DST gap, which
+        # daily and longer rules never produce
+        for occurrence_start, (_, key, override) in zip(starts, chunk):
+            if occurrence_start < start_date:
+                continue
+            if occurrence_start > end_date:
+                return
+            yield occurrence_start, key, localized_override(override, tzid)
+
+def localized_override(override: Optional[dict], tzid: str) -> Optional[dict]:
+    """An override of a zoned series with its wall-clock dates localized"""
+    if override and (override.get("start_date") or override.get("end_date")):
+        fields = [field for field in ("start_date", "end_date") if override.get(field)]
+        localized = localize_wall_times([parse_iso(override[field]) for field in fields], tzid)
+        override = dict(override, **{field: value.isoformat() for field, value in zip(fields, localized)})
+    return override
+
+def occurrence_starts(event: dict, start_date: datetime, end_date: datetime) -> List[datetime]:
+    """Start of each occurrence inside the window, without building occurrence dicts.
+
+    Like expand_recurring_events, one-off events are returned as-is whatever the window.
+    """
+    return [occurrence_date for occurrence_date, _, _ in iter_occurrences(event, start_date, end_date)]
+
+def occurrence_offsets(event: dict, start_date: datetime, end_date: datetime) -> List[int]:
+    """Seconds from the series start to each occurrence inside the window"""
+    event_start = series_start(event)
+    return [int((d - event_start).total_seconds()) for d in occurrence_starts(event, start_date, end_date)]
+
+def busy_intervals(event: dict, start_date: datetime, end_date: datetime) -> List[Tuple[datetime, datetime]]:
+    """(start, end) of every occurrence overlapping the window, clipped to it.
+
+    All-day events block whole days. Occurrences that started before the window but are
+    still running are included, and zero-length events block nothing.
+    """
+    start_date, end_date = align_to_series(event, start_date, end_date)
+    event_start = series_start(event)
+    event_end = series_end(event) or event_start
+    all_day = event.get("all_day", False)
+    if all_day:
+        midnight = dict(hour=0, minute=0, second=0, microsecond=0)
+        event_end = event_end.replace(**midnight) + timedelta(days=1)
+        duration = event_end - event_start.replace(**midnight)
+    else:
+        duration = event_end - event_start
+    if duration <= timedelta(0):
+        return []
+    
+    intervals = []
+    for occurrence_start, _, override in iter_occurrences(event, start_date - duration - timedelta(days=1), end_date):
+        if all_day:
+            occurrence_start = occurrence_start.replace(**midnight)
+        if override and override.get("end_date"):
+            occurrence_end = parse_iso(override["end_date"])
+            if all_day:
+                occurrence_end = occurrence_end.replace(**midnight) + timedelta(days=1)
+        else:
+            occurrence_end = occurrence_start + duration
+        if occurrence_end > start_date and occurrence_start < end_date:
+            intervals.append((max(occurrence_start, start_date), min(occurrence_end, end_date)))
+    return intervals
+
+def merge_intervals(intervals: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """Sort-and-sweep union of overlapping or touching intervals"""
+    merged: List[Tuple[datetime, datetime]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def iter_timed_occurrences(event: dict, start_date: datetime, end_date: datetime,
+                           resume_from: Optional[datetime] = None) -> Iterator[Tuple[datetime, dict]]:
+    """Lazily yield (start, occurrence) for a recurring event within the date range, in start order.
+
+    resume_from skips occurrences starting before it (used by paging); the window's first
+    occurrence is still the one reported as the original event.
+    """
+    trace = debug_trace_id.get()
+    if trace:
+        recurrence_logger.debug("expand trace=%s event=%s recurrence=%s", trace, event.get("_id"), event.get("recurrence"))
+    
+    start_date, end_date = align_to_series(event, start_date, end_date)
+    if event.get("all_day"):
+        # An all-day occurrence covers its whole day, so one from earlier that day still counts
+        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    if not event.get("recurrence") or event["recurrence"].get("type") == "none":
+        yield series_start(event), event
+        return
+    
+    if event["recurrence"]["type"] not in RECURRENCE_FREQUENCIES:
+        if trace:
+            recurrence_logger.debug("unknown_frequency trace=%s event=%s type=%s", trace, event.get("_id"), event["recurrence"]["type"])
+        yield series_start(event), event
+        return
+    
+    # First occurrence in the window is the original event, subsequent ones are recurring instances
     first_occurrence = True
-    for occurrence_date in rrule(**rrule_params):
-        print(f"DEBUG: Processing occurrence at {occurrence_date}")
-        if start_date <= occurrence_date <= end_date:
-            occurrence_event = event.copy()
-            # Calculate duration
-            if event.get("end_date"):
-                original_end = datetime.fromisoformat(event["end_date"].replace('Z', '+00:00'))
-                duration = original_end - event_start
-                new_end = occurrence_date + duration
-                occurrence_event["end_date"] = new_end.isoformat()
-            
-            occurrence_event["start_date"] = occurrence_date.isoformat()
-            
-            # First occurrence is the original event, subsequent ones are recurring instances
-            if first_occurrence:
-                occurrence_event["is_recurring_instance"] = False
-                print(f"DEBUG: First occurrence (original) at {occurrence_date}")
-                first_occurrence = False
-            else:
-                occurrence_event["is_recurring_instance"] = True
-                occurrence_event["original_event_id"] = str(event["_id"])
-                print(f"DEBUG: Recurring instance at {occurrence_date}")
-            
-            occurrences.append(occurrence_event)
+    window_first = None
+    if resume_from is not None:
+        resume_from, = align_to_series(event, resume_from)
+    if resume_from is not None and resume_from > start_date:
+        first_occurrence = False
+        window_first, _, _ = next(iter_occurrences(event, start_date, end_date), (None, None, None))
+        start_date = resume_from
+    
+    if trace:
+        recurrence_logger.debug("window trace=%s event=%s start=%s end=%s tzid=%s",
+                                trace, event.get("_id"), start_date, end_date, event.get("tzid"))
     
-    print(f"DEBUG: Generated {len(occurrences)} occurrences")
+    # Duration is the same for every occurrence, so work it out once per series; like RFC 5545
+    # it is exact time, so an occurrence spanning a DST change ends an hour off on the clock
+    end = series_end(event)
+    duration = end - series_start(event) if end is not None else None
+    # Only the occurrence standing in for the series carries its exception data
+    instance_base = event
+    if event.get("exdates") or event.get("overrides"):
+        instance_base = {k: v for k, v in event.items() if k not in ("exdates", "overrides")}
+    
+    # Generate occurrences, seeked to the window (or the resume point) by iter_occurrences
+    occurrences = iter_occurrences(event, start_date, end_date)
+    for occurrence_date, original_start, override in occurrences:
+        is_instance = not (first_occurrence or occurrence_date == window_first)
+        first_occurrence = False
+        occurrence_event = instance_base.copy() if is_instance else event.copy()
+        if duration is not None:
+            occurrence_event["end_date"] = (occurrence_date + duration).isoformat()
+        
+        occurrence_event["start_date"] = occurrence_date.isoformat()
+        if override:
+            occurrence_event.update(override)
+            occurrence_event["original_start_date"] = original_start
+        
+        if is_instance:
+            occurrence_event["is_recurring_instance"] = True
+            occurrence_event["original_event_id"] = str(event["_id"])
+        else:
+            occurrence_event["is_recurring_instance"] = False
+        
+        if trace:
+            recurrence_logger.debug("occurrence trace=%s event=%s start=%s instance=%s",
+                                    trace, event.get("_id"), occurrence_event["start_date"],
+                                    occurrence_event["is_recurring_instance"])
+        yield occurrence_date, occurrence_event
+
+def iter_recurring_events(event: dict, start_date: datetime, end_date: datetime,
+                          resume_from: Optional[datetime] = None) -> Iterator[dict]:
+    """Lazily yield a recurring event's occurrences within the date range, in start order"""
+    for _, occurrence in iter_timed_occurrences(event, start_date, end_date, resume_from):
+        yield occurrence
+
+def expand_recurring_events(event: dict, start_date: datetime, end_date: datetime) -> List[dict]:
+    """Expand a recurring event into individual occurrences within the date range"""
+    occurrences = list(iter_recurring_events(event, start_date, end_date))
+    trace = debug_trace_id.get()
+    if trace:
+        recurrence_logger.debug("expanded trace=%s event=%s occurrences=%d", trace, event.get("_id"), len(occurrences))
     return occurrences
 
+# effective_end of a series that never finishes; sorts after every stored ISO date
+OPEN_ENDED = "9999-12-31T23:59:59"
+
+def effective_start(event: dict) -> str:
+    """Earliest moment any occurrence of an event can start, as naive UTC; stored as effective_start.
+
+    That is the event's own start, or earlier where an override moved an instance before it.
+    """
+    if event.get("tzid"):
+        start = parse_iso(effective_start(wall_clock_view(event)))
+        return to_utc_naive(localize_wall_times([start], event["tzid"])[0]).isoformat()
+    starts = [parse_iso(event["start_date"])]
+    starts.extend(parse_iso(o["start_date"]) for o in (event.get("overrides") or {}).values() if o.get("start_date"))
+    return min(to_utc_naive(start) for start in starts).isoformat()
+
+def effective_end(event: dict) -> str:
+    """Latest moment any occurrence of an event can end, as naive UTC; stored as effective_end.
+
+    A one-off event ends at its end (or start). A finished series ends at its last possible
+    start plus the event's duration, or later where an override moved an instance past that;
+    a series without an end date or count never does. All-day events run to the end of that day.
+    """
+    if event.get("tzid"):
+        # Worked out in wall-clock time, then localized
+        end = effective_end(wall_clock_view(event))
+        if end == OPEN_ENDED:
+            return end
+        return to_utc_naive(localize_wall_times([parse_iso(end)], event["tzid"])[0]).isoformat()
+    recurrence = event.get("recurrence") or {}
+    if recurrence.get("type") not in RECURRING_TYPES:
+        latest = to_utc_naive(parse_iso(event.get("end_date") or event["start_date"]))
+    else:
+        start = parse_iso(event["start_date"])
+        duration = max(parse_iso(event["end_date"]) - start, timedelta(0)) if event.get("end_date") else timedelta(0)
+        last_starts = [parse_iso(recurrence["end_date"])] if recurrence.get("end_date") else []
+        if recurrence.get("count"):
+            last_starts.append(parse_iso(recurrence.get("last_occurrence") or count_last_occurrence(start, recurrence)))
+        if not last_starts:
+            return OPEN_ENDED
+        ends = [min(to_utc_naive(last_start) for last_start in last_starts) + duration]
+        for key, override in (event.get("overrides") or {}).items():
+            moved_start = parse_iso(override.get("start_date") or key)
+            ends.append(to_utc_naive(parse_iso(override["end_date"]) if override.get("end_date") else moved_start + duration))
+        latest = max(ends)
+    if event.get("all_day"):
+        # All-day events last until the end of their last day, as busy_intervals blocks them
+        latest = latest.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1, microseconds=-1)
+    return latest.isoformat()
+
+def effective_range(event: dict) -> Dict[str, str]:
+    """The derived fields range_query filters on, to store with an event"""
+    return {"effective_start": effective_start(event), "effective_end": effective_end(event)}
+
+def range_query(start_date: str, end_date: str) -> dict:
+    """Mongo filter for events that can produce something inside [start_date, end_date].
+
+    Events must start before the window ends and not be over before it starts. Both bounds
+    and the stored effective_start/effective_end are naive UTC, so floating, offset and
+    zoned events compare alike, and finished series drop out in the index like one-off events.
+    """
+    start, end = (to_utc_naive(parse_iso(value)).isoformat() for value in (start_date, end_date))
+    return {"effective_start": {"$lte": end}, "effective_end": {"$gte": start}}
+
+def encode_cursor(occurrence_start: datetime, series_id: str) -> str:
+    """Opaque paging cursor for the position (occurrence start, series id)"""
+    raw = json.dumps([occurrence_start.isoformat(), series_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        occurrence_start, series_id = json.loads(raw)
+        return datetime.fromisoformat(occurrence_start), str(series_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate_occurrences(events: List[dict], start_date: datetime, end_date: datetime, limit: int,
+                         after: Optional[Tuple[datetime, str]] = None) -> Tuple[List[dict], Optional[str]]:
+    """Return the next `limit` occurrences ordered by (start, series id), plus the cursor for the page after.
+
+    Each series is expanded lazily from the cursor position and the streams are heap-merged,
+    so a page costs O(limit * log(series)) occurrences instead of expanding the whole window.
+    """
+    def keyed(event: dict) -> Iterator[Tuple[datetime, str, dict]]:
+        series_id = str(event["_id"])
+        resume_from = after[0] if after else None
+        for occurrence_start, occurrence in iter_timed_occurrences(event, start_date, end_date, resume_from):
+            # Naive UTC keys let zoned, offset and floating series merge into one order
+            yield to_utc_naive(occurrence_start), series_id, occurrence
+    
+    page = []
+    for occurrence_start, series_id, occurrence in heapq.merge(*(keyed(e) for e in events), key=lambda item: item[:2]):
+        if after and (occurrence_start, series_id) <= after:
+            continue
+        if len(page) == limit:
+            last_start, last_series_id, _ = page[-1]
+            return [item[2] for item in page], encode_cursor(last_start, last_series_id)
+        page.append((occurrence_start, series_id, occurrence))
+    return [item[2] for item in page], None
+
+class OccurrenceCache:
+    """LRU cache of expanded occurrences per (series id, updated_at, month).
+
+    A window is served by slicing the calendar-month buckets it overlaps, so views whose
+    bounds differ by a few milliseconds share entries. Keying on updated_at means an edited
+    series can never be served stale; update and delete also drop a series' entries eagerly
+    to free memory. Cached occurrences are shared between requests and must be treated as
+    read-only.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple[str, Any, str], Tuple[List[datetime], List[dict], int]]" = OrderedDict()
+        self._keys_by_series: Dict[str, Set[Tuple[str, Any, str]]] = {}
+
+    @staticmethod
+    def _estimate_size(occurrences: List[dict]) -> int:
+        size = sys.getsizeof(occurrences)
+        if occurrences:
+            sample = occurrences[0]
+            per_occurrence = sys.getsizeof(sample) + sum(sys.getsizeof(v) for v in sample.values())
+            size += per_occurrence * len(occurrences)
+        return size
+
+    def _bucket(self, event: dict, series_id: str, month_start: datetime) -> Tuple[List[datetime], List[dict]]:
+        """(starts, occurrences) of the series in one calendar month, every one as an instance"""
+        key = (series_id, event.get("updated_at"), month_start.isoformat())
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+        
+        self.misses += 1
+        month_end = month_start + relativedelta(months=1) - timedelta(microseconds=1)
+        starts, occurrences = [], []
+        for occurrence_start, occurrence in iter_timed_occurrences(event, month_start, month_end):
+            if not occurrence["is_recurring_instance"]:
+                occurrence = {k: v for k, v in occurrence.items() if k not in ("exdates", "overrides")}
+                occurrence["is_recurring_instance"] = True
+                occurrence["original_event_id"] = series_id
+            starts.append(occurrence_start)
+            occurrences.append(occurrence)
+        size = self._estimate_size(occurrences) + sys.getsizeof(starts)
+        if size > self.max_bytes:
+            return starts, occurrences
+        
+        self._entries[key] = (starts, occurrences, size)
+        self._keys_by_series.setdefault(series_id, set()).add(key)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return starts, occurrences
+
+    def get_or_expand(self, event: dict, start_date: datetime, end_date: datetime) -> List[dict]:
+        if not event.get("recurrence") or event["recurrence"].get("type") not in RECURRENCE_FREQUENCIES:
+            return expand_recurring_events(event, start_date, end_date)
+        
+        series_id = str(event["_id"])
+        start_date, end_date = align_to_series(event, start_date, end_date)
+        if start_date.tzinfo is not None:
+            start_date, end_date = start_date.astimezone(timezone.utc), end_date.astimezone(timezone.utc)
+        if event.get("all_day"):
+            start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        occurrences: List[dict] = []
+        month_start = start_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        while month_start <= end_date:
+            starts, bucket = self._bucket(event, series_id, month_start)
+            occurrences.extend(bucket[bisect_left(starts, start_date):bisect_right(starts, end_date)])
+            month_start += relativedelta(months=1)
+        
+        # As in expand_recurring_events, the window's first occurrence stands in for the series
+        if occurrences:
+            first = dict(event, **occurrences[0])
+            del first["original_event_id"]
+            first["is_recurring_instance"] = False
+            occurrences[0] = first
+        return occurrences
+
+    def _remove(self, key: Tuple[str, Any, str]):
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+        series_keys = self._keys_by_series[key[0]]
+        series_keys.discard(key)
+        if not series_keys:
+            del self._keys_by_series[key[0]]
+
+    def invalidate(self, series_id: str):
+        for key in list(self._keys_by_series.get(series_id, ())):
+            self._remove(key)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+occurrence_cache = OccurrenceCache(int(os.environ.get("OCCURRENCE_CACHE_BYTES", 64 * 1024 * 1024)))
+
+def to_utc_naive(value: datetime) -> datetime:
+    """Common comparison form for naive (assumed UTC) and offset-aware datetimes"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def utc_busy_intervals(event: dict, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """busy_intervals for a naive UTC window, returned as naive UTC whatever the event's own flavour"""
+    intervals = busy_intervals(event, start, end)
+    return [(to_utc_naive(s), to_utc_naive(e)) for s, e in intervals]
+
+class _IntervalNode:
+    __slots__ = ("start", "end", "key", "priority", "max_end", "left", "right")
+
+    def __init__(self, start: datetime, end: datetime, key: str):
+        self.start = start
+        self.end = end
+        self.key = key
+        self.priority = random.random()
+        self.max_end = end
+        self.left: Optional["_IntervalNode"] = None
+        self.right: Optional["_IntervalNode"] = None
+
+class IntervalTree:
+    """Half-open [start, end) intervals in a treap ordered by (start, end, key).
+
+    Every node stores the largest end in its subtree, so overlap queries prune whole subtrees
+    and run in O(log n + k); insert and remove are O(log n) expected.
+    """
+
+    def __init__(self):
+        self.root: Optional[_IntervalNode] = None
+        self.size = 0
+
+    @classmethod
+    def build(cls, intervals: List[Tuple[datetime, datetime, str]]) -> "IntervalTree":
+        """Balanced tree from a batch of intervals in O(n log n), much cheaper than n inserts"""
+        tree = cls()
+        ordered = sorted(intervals)
+        
+        def subtree(lo: int, hi: int, priority: float) -> Optional[_IntervalNode]:
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            node = _IntervalNode(*ordered[mid])
+            # Priorities shrink with depth so the balanced shape is a valid treap
+            node.priority = priority
+            node.left = subtree(lo, mid, priority / 2)
+            node.right = subtree(mid + 1, hi, priority / 2)
+            cls._update(node)
+            return node
+        
+        tree.root = subtree(0, len(ordered), 1.0)
+        tree.size = len(ordered)
+        return tree
+
+    @staticmethod
+    def _update(node: _IntervalNode):
+        node.max_end = node.end
+        if node.left and node.left.max_end > node.max_end:
+            node.max_end = node.left.max_end
+        if node.right and node.right.max_end > node.max_end:
+            node.max_end = node.right.max_end
+
+    def _split(self, node: Optional[_IntervalNode], key: tuple, inclusive: bool):
+        """Split into (nodes < key, nodes >= key), or (<= key, > key) when inclusive"""
+        if node is None:
+            return None, None
+        node_key = (node.start, node.end, node.key)
+        if node_key < key or (inclusive and node_key == key):
+            node.right, right = self._split(node.right, key, inclusive)
+            self._update(node)
+            return node, right
+        left, node.left = self._split(node.left, key, inclusive)
+        self._update(node)
+        return left, node
+
+    def _merge(self, left: Optional[_IntervalNode], right: Optional[_IntervalNode]) -> Optional[_IntervalNode]:
+        if left is None or right is None:
+            return left or right
+        if left.priority > right.priority:
+            left.right = self._merge(left.right, right)
+            self._update(left)
+            return left
+        right.left = self._merge(left, right.left)
+        self._update(right)
+        return right
+
+    def insert(self, start: datetime, end: datetime, key: str):
+        left, right = self._split(self.root, (start, end, key), inclusive=False)
+        self.root = self._merge(self._merge(left, _IntervalNode(start, end, key)), right)
+        self.size += 1
+
+    def remove(self, start: datetime, end: datetime, key: str):
+        left, rest = self._split(self.root, (start, end, key), inclusive=False)
+        removed, right = self._split(rest, (start, end, key), inclusive=True)
+        if removed is not None:
+            self.size -= 1
+        self.root = self._merge(left, right)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime, str]]:
+        """Intervals with interval.start < end and interval.end > start, in start order"""
+        found = []
+        stack = []
+        node = self.root
+        while stack or node is not None:
+            # In-order walk, skipping subtrees that end too early or start too late
+            while node is not None and node.max_end > start:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                break
+            node = stack.pop()
+            if node.start >= end:
+                break
+            if node.end > start:
+                found.append((node.start, node.end, node.key))
+            node = node.right
+        return found
+
+    def at(self, moment: datetime) -> List[Tuple[datetime, datetime, str]]:
+        return self.overlapping(moment, moment + timedelta(microseconds=1))
+
+class OccurrenceIndex:
+    """Per-process interval index of every occurrence between a short lookback and a horizon.
+
+    Write endpoints update it series by series; the window is rebuilt once a day as time moves.
+    Queries outside the window have to go to Mongo instead.
+    """
+
+    def __init__(self, lookback_days: int, horizon_days: int):
+        self.lookback = timedelta(days=lookback_days)
+        self.horizon = timedelta(days=horizon_days)
+        self.tree = IntervalTree()
+        self.window_start: Optional[datetime] = None
+        self.window_end: Optional[datetime] = None
+        self._by_series: Dict[str, List[Tuple[datetime, datetime]]] = {}
+        # Just enough of each indexed series to answer conflict checks without a Mongo read
+        self.summaries: Dict[str, dict] = {}
+        # Series written while a rebuild reads Mongo (None once deleted); they override what it read
+        self._written_during_rebuild: Optional[Dict[str, Optional[dict]]] = None
+        self._rebuild_lock = asyncio.Lock()
+
+    def covers(self, start: datetime, end: datetime) -> bool:
+        return self.window_start is not None and self.window_start <= start and end <= self.window_end
+
+    def is_stale(self) -> bool:
+        return self.window_start is None or datetime.utcnow() - self.lookback > self.window_start + timedelta(days=1)
+
+    async def rebuild(self):
+        """Rebuild the index for a window around now.
+
+        Queries keep using the old window and tree until the new ones are complete, and then
+        everything is swapped in at once.
+        """
+        async with self._rebuild_lock:
+            now = datetime.utcnow()
+            window_start, window_end = now - self.lookback, now + self.horizon
+            by_series: Dict[str, List[Tuple[datetime, datetime]]] = {}
+            summaries: Dict[str, dict] = {}
+            self._written_during_rebuild = written = {}
+            try:
+                async for event in db.events.find(range_query(window_start.isoformat(), window_end.isoformat())):
+                    intervals = utc_busy_intervals(event, window_start, window_end)
+                    if intervals:
+                        by_series[str(event["_id"])] = intervals
+                        summaries[str(event["_id"])] = self._summary(event)
+            finally:
+                self._written_during_rebuild = None
+            # The cursor may have returned these before they were written, or missed them
+            for series_id, event in written.items():
+                by_series.pop(series_id, None)
+                summaries.pop(series_id, None)
+                intervals = utc_busy_intervals(event, window_start, window_end) if event is not None else []
+                if intervals:
+                    by_series[series_id] = intervals
+                    summaries[series_id] = self._summary(event)
+            tree = IntervalTree.build([
+                (start, end, series_id) for series_id, intervals in by_series.items() for start, end in intervals])
+            self.window_start, self.window_end, self.tree = window_start, window_end, tree
+            self._by_series, self.summaries = by_series, summaries
+
+    async def run(self, check_every: float = 3600.0):
+        """Rebuild the window in the background whenever it goes stale, until cancelled"""
+        while True:
+            await asyncio.sleep(check_every)
+            if not self.is_stale():
+                continue
+            try:
+                await self.rebuild()
+            except Exception:
+                logger.exception("Failed to rebuild the occurrence index")
+
+    @staticmethod
+    def _summary(event: dict) -> dict:
+        return {"title": event.get("title"), "all_day": event.get("all_day", False)}
+
+    def add_series(self, event: dict):
+        series_id = str(event["_id"])
+        if self._written_during_rebuild is not None:
+            self._written_during_rebuild[series_id] = event
+        if self.window_start is None:
+            return
+        self._drop(series_id)
+        intervals = utc_busy_intervals(event, self.window_start, self.window_end)
+        for start, end in intervals:
+            self.tree.insert(start, end, series_id)
+        if intervals:
+            self._by_series[series_id] = intervals
+            self.summaries[series_id] = self._summary(event)
+
+    def remove_series(self, series_id: str):
+        if self._written_during_rebuild is not None:
+            self._written_during_rebuild[series_id] = None
+        self._drop(series_id)
+
+    def _drop(self, series_id: str):
+        self.summaries.pop(series_id, None)
+        for start, end in self._by_series.pop(series_id, ()):
+            self.tree.remove(start, end, series_id)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime, str]]:
+        return self.tree.overlapping(to_utc_naive(start), to_utc_naive(end))
+
+    def at(self, moment: datetime) -> List[Tuple[datetime, datetime, str]]:
+        return self.tree.at(to_utc_naive(moment))
+
+occurrence_index = OccurrenceIndex(
+    lookback_days=int(os.environ.get("OCCURRENCE_INDEX_LOOKBACK_DAYS", "7")),
+    horizon_days=int(os.environ.get("OCCURRENCE_INDEX_HORIZON_DAYS", "180")),
+)
+
+class LogReminderSink:
+    """Default sink: due reminders only show up in the server log"""
+
+    async def deliver(self, reminder: dict):
+        logger.info("Reminder due: %s", reminder)
+
+    async def close(self):
+        pass
+
+class QueueReminderSink:
+    """In-process stand-in for a message queue, drained by whoever owns the queue"""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def deliver(self, reminder: dict):
+        self.queue.put_nowait(reminder)
+
+    async def close(self):
+        pass
+
+class WebhookReminderSink:
+    """POSTs each due reminder as JSON to a local webhook over one pooled HTTP client.
+
+    Connection errors and 5xx responses are retried with a short exponential backoff.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0, max_attempts: int = 3,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.url = url
+        self.max_attempts = max_attempts
+        self._http = httpx.AsyncClient(timeout=timeout, transport=transport)
+
+    async def deliver(self, reminder: dict):
+        body = orjson.dumps(reminder)
+        for attempt in range(self.max_attempts):
+            try:
+                response = await self._http.post(self.url, content=body, headers={"Content-Type": "application/json"})
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    return
+                error: Exception = httpx.HTTPStatusError(
+                    f"Webhook answered {response.status_code}", request=response.request, response=response)
+            except httpx.TransportError as exc:
+                error = exc
+            if attempt + 1 == self.max_attempts:
+                raise error
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def close(self):
+        await self._http.aclose()
+
+def utc_occurrence_starts(event: dict, start: datetime, end: datetime) -> List[datetime]:
+    """Occurrence starts in the naive UTC window [start, end), as naive UTC"""
+    starts = (to_utc_naive(d) for d in occurrence_starts(event, start, end))
+    return [d for d in starts if start <= d < end]
+
+class _SeriesReminders:
+    """Pending firings of one series, expanded a horizon-sized chunk of occurrences at a time"""
+
+    def __init__(self, event: dict, scheduled_from: datetime):
+        self.event = event
+        self.leads = sorted({timedelta(minutes=r["minutes_before"]) for r in event["reminders"]})
+        self.notification_ids = {r["minutes_before"]: r.get("notification_id") for r in event["reminders"]}
+        self.scheduled_from = scheduled_from
+        self.covered_until = scheduled_from
+        self.pending: List[Tuple[datetime, datetime, timedelta]] = []
+        recurrence = event.get("recurrence") or {}
+        if recurrence.get("type") in RECURRING_TYPES:
+            ends = [to_utc_naive(parse_iso(end)) for end in (recurrence.get("end_date"), recurrence.get("last_occurrence")) if end]
+            self.last_start = min(ends) + timedelta(days=1) if ends else None
+        else:
+            self.last_start = to_utc_naive(series_start(event))
+
+    def _finished(self) -> bool:
+        return self.last_start is not None and self.covered_until > self.last_start
+
+    def next_fire(self, now: datetime, horizon: timedelta) -> Optional[datetime]:
+        """When the scheduler should next look at this series; None once nothing is left"""
+        while True:
+            # Occurrences past covered_until can still fire before it, by up to the longest lead
+            settled_before = self.covered_until - self.leads[-1]
+            if self.pending and (self.pending[0][0] < settled_before or self._finished()):
+                return self.pending[0][0]
+            if self._finished():
+                return None
+            if settled_before >= now + horizon:
+                return settled_before  # wake up to expand the next chunk
+            chunk_end = self.covered_until + horizon
+            if self.last_start is not None:
+                chunk_end = min(chunk_end, self.last_start + timedelta(microseconds=1))
+            for start in utc_occurrence_starts(self.event, self.covered_until, chunk_end):
+                for lead in self.leads:
+                    if start - lead >= self.scheduled_from:
+                        heapq.heappush(self.pending, (start - lead, start, lead))
+            self.covered_until = chunk_end
+
+    def take_due(self, now: datetime) -> List[dict]:
+        settled_before = self.covered_until - self.leads[-1]
+        due = []
+        while self.pending and self.pending[0][0] <= now and (self.pending[0][0] < settled_before or self._finished()):
+            fire_at, start, lead = heapq.heappop(self.pending)
+            minutes_before = int(lead.total_seconds() // 60)
+            due.append({
+                "event_id": str(self.event["_id"]),
+                "title": self.event.get("title"),
+                "occurrence_start": start.isoformat(),
+                "minutes_before": minutes_before,
+                "fire_at": fire_at.isoformat(),
+                "notification_id": self.notification_ids.get(minutes_before),
+            })
+        return due
+
+class ReminderScheduler:
+    """Time-ordered queue of upcoming reminder firings for every series with reminders.
+
+    The heap holds one (time, generation) entry per series, so rescheduling is an O(log n) push
+    and the superseded entry is dropped lazily when it surfaces. Series only expand occurrences
+    up to `horizon_days` ahead and extend themselves as time passes.
+    """
+
+    def __init__(self, sink, horizon_days: int, max_concurrent_deliveries: int = 16):
+        self.sink = sink
+        self.horizon = timedelta(days=horizon_days)
+        # Deliveries run as tasks so a slow sink never holds up the reminders due after it
+        self._delivery_slots = asyncio.Semaphore(max_concurrent_deliveries)
+        self._deliveries: Set[asyncio.Task] = set()
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._series: Dict[str, Tuple[int, _SeriesReminders]] = {}
+        self._generation = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self.delivered = 0
+        self.failed = 0
+
+    def _push(self, series_id: str, now: datetime):
+        generation, series = self._series[series_id]
+        fire_at = series.next_fire(now, self.horizon)
+        if fire_at is None:
+            del self._series[series_id]
+            return
+        heapq.heappush(self._heap, (fire_at, generation, series_id))
+        if self._wakeup is not None and self._heap[0][1] == generation:
+            self._wakeup.set()
+        # Superseded entries are skipped when popped; compact once they dominate the heap
+        if len(self._heap) > 2 * len(self._series) + 1024:
+            self._heap = [entry for entry in self._heap
+                          if entry[2] in self._series and self._series[entry[2]][0] == entry[1]]
+            heapq.heapify(self._heap)
+
+    def schedule(self, event: dict, now: Optional[datetime] = None):
+        """(Re)schedule every future firing of a created or updated series"""
+        series_id = str(event["_id"])
+        if not event.get("reminders"):
+            self._series.pop(series_id, None)
+            return
+        now = now or datetime.utcnow()
+        self._generation += 1
+        self._series[series_id] = (self._generation, _SeriesReminders(event, now))
+        self._push(series_id, now)
+
+    def unschedule(self, series_id: str):
+        self._series.pop(series_id, None)
+
+    async def rebuild(self, now: Optional[datetime] = None):
+        now = now or datetime.utcnow()
+        self._heap = []
+        self._series = {}
+        query = dict(range_query(now.isoformat(), datetime.max.isoformat()), **{"reminders.0": {"$exists": True}})
+        async for event in db.events.find(query):
+            self._generation += 1
+            self._series[str(event["_id"])] = (self._generation, _SeriesReminders(event, now))
+        for series_id in list(self._series):
+            generation, series = self._series[series_id]
+            fire_at = series.next_fire(now, self.horizon)
+            if fire_at is None:
+                del self._series[series_id]
+            else:
+                self._heap.append((fire_at, generation, series_id))
+        heapq.heapify(self._heap)
+
+    def next_due(self) -> Optional[datetime]:
+        while self._heap:
+            fire_at, generation, series_id = self._heap[0]
+            if series_id in self._series and self._series[series_id][0] == generation:
+                return fire_at
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: datetime) -> List[dict]:
+        """Remove and return every reminder due at `now`, in firing order"""
+        due = []
+        while True:
+            fire_at = self.next_due()
+            if fire_at is None or fire_at > now:
+                return sorted(due, key=lambda r: r["fire_at"])
+            _, _, series_id = heapq.heappop(self._heap)
+            due.extend(self._series[series_id][1].take_due(now))
+            self._push(series_id, now)
+
+    async def _deliver(self, reminder: dict):
+        async with self._delivery_slots:
+            try:
+                await self.sink.deliver(reminder)
+                self.delivered += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Failed to deliver reminder for event %s", reminder["event_id"])
+
+    async def run(self, max_sleep: float = 60.0):
+        """Deliver due reminders to the sink, a bounded number at a time, until cancelled"""
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                self._wakeup.clear()
+                for reminder in self.pop_due(datetime.utcnow()):
+                    delivery = asyncio.create_task(self._deliver(reminder))
+                    self._deliveries.add(delivery)
+                    delivery.add_done_callback(self._deliveries.discard)
+                next_due = self.next_due()
+                sleep = max_sleep if next_due is None else (next_due - datetime.utcnow()).total_seconds()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(max(sleep, 0), max_sleep))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for delivery in list(self._deliveries):
+                delivery.cancel()
+
+    def stats(self) -> dict:
+        next_due = self.next_due()
+        return {
+            "series": len(self._series),
+            "queued_firings": sum(len(series.pending) for _, series in self._series.values()),
+            "next_due": next_due.isoformat() if next_due else None,
+            "delivering": len(self._deliveries),
+            "delivered": self.delivered,
+            "failed": self.failed,
+        }
+
+def make_reminder_sink():
+    webhook_url = os.environ.get("REMINDER_WEBHOOK_URL")
+    return WebhookReminderSink(webhook_url) if webhook_url else LogReminderSink()
+
+reminder_scheduler = ReminderScheduler(
+    make_reminder_sink(),
+    int(os.environ.get("REMINDER_HORIZON_DAYS", "30")),
+    max_concurrent_deliveries=int(os.environ.get("REMINDER_DELIVERY_CONCURRENCY", "16")),
+)
+
+def series_written(event: dict):
+    """Keep the in-process occurrence structures in step with a created or updated series"""
+    occurrence_cache.invalidate(str(event["_id"]))
+    occurrence_index.add_series(event)
+    reminder_scheduler.schedule(event)
+
+def series_deleted(event_id: str):
+    occurrence_cache.invalidate(event_id)
+    occurrence_index.remove_series(event_id)
+    reminder_scheduler.unschedule(event_id)
+
+CONFLICT_HORIZON_DAYS = int(os.environ.get("CONFLICT_HORIZON_DAYS", "90"))
+CONFLICT_CHECK_BUDGET_MS = float(os.environ.get("CONFLICT_CHECK_BUDGET_MS", "100"))
+MAX_REPORTED_CONFLICTS = 50
+
+def conflict_window(event: dict) -> Tuple[datetime, datetime]:
+    """Naive UTC window an event's own occurrences are checked in; series look ahead a fixed horizon"""
+    start = to_utc_naive(series_start(event))
+    end = to_utc_naive(series_end(event)) if event.get("end_date") else start
+    if (event.get("recurrence") or {}).get("type") not in RECURRING_TYPES:
+        return start, max(start, end)
+    start = max(start, datetime.utcnow())
+    return start, start + timedelta(days=CONFLICT_HORIZON_DAYS)
+
+def check_deadline(deadline: Optional[float]):
+    """Raise asyncio.TimeoutError once time.monotonic() is past deadline.
+
+    asyncio.wait_for can only interrupt at an await, so CPU-bound loops check this themselves.
+    """
+    if deadline is not None and time.monotonic() > deadline:
+        raise asyncio.TimeoutError
+
+async def find_conflicts(event: dict, exclude_id: Optional[str] = None,
+                         deadline: Optional[float] = None) -> List[dict]:
+    """Other timed events with an occurrence overlapping one of this event's occurrences.
+
+    Answered from the occurrence index when it covers the window, otherwise from an indexed
+    range query plus windowed expansion of just the matching series. All-day events never conflict.
+    Raises asyncio.TimeoutError once past a time.monotonic() deadline, if one is given.
+    """
+    if event.get("all_day"):
+        return []
+    window_start, window_end = conflict_window(event)
+    candidate = utc_busy_intervals(event, window_start, window_end)
+    if not candidate:
+        return []
+    check_deadline(deadline)
+    window_start, window_end = candidate[0][0], max(end for _, end in candidate)
+    
+    # series id -> overlapping (start, end) occurrences of that series
+    overlaps: Dict[str, Set[Tuple[datetime, datetime]]] = {}
+    others: Dict[str, dict] = {}
+    if occurrence_index.covers(window_start, window_end):
+        for start, end in candidate:
+            check_deadline(deadline)
+            for other_start, other_end, series_id in occurrence_index.overlapping(start, end):
+                if series_id != exclude_id:
+                    overlaps.setdefault(series_id, set()).add((other_start, other_end))
+        others = {series_id: occurrence_index.summaries[series_id] for series_id in overlaps}
+    else:
+        async for other in db.events.find(range_query(window_start.isoformat(), window_end.isoformat())):
+            check_deadline(deadline)
+            series_id = str(other["_id"])
+            if series_id == exclude_id or other.get("all_day"):
+                continue
+            hits = set()
+            theirs = utc_busy_intervals(other, window_start, window_end)
+            i = j = 0
+            # Both lists are in start order, so a two-pointer sweep finds every overlap
+            while i < len(candidate) and j < len(theirs):
+                if candidate[i][0] < theirs[j][1] and theirs[j][0] < candidate[i][1]:
+                    hits.add(theirs[j])
+                if candidate[i][1] <= theirs[j][1]:
+                    i += 1
+                else:
+                    j += 1
+            if hits:
+                overlaps[series_id] = hits
+                others[series_id] = other
+    
+    conflicts = []
+    for series_id, hits in overlaps.items():
+        other = others.get(series_id)
+        if other is None or other.get("all_day"):
+            continue
+        first_start, first_end = min(hits)
+        conflicts.append({
+            "_id": series_id,
+            "title": other.get("title"),
+            "start": first_start.isoformat(),
+            "end": first_end.isoformat(),
+            "occurrences": len(hits),
+        })
+    conflicts.sort(key=lambda c: (c["start"], c["_id"]))
+    return conflicts[:MAX_REPORTED_CONFLICTS]
+
+async def reject_conflicts(event: dict, response: Response, exclude_id: Optional[str] = None):
+    """409 listing the conflicts, if any; past the latency budget the check is skipped, not the save"""
+    budget = CONFLICT_CHECK_BUDGET_MS / 1000
+    try:
+        # wait_for bounds the Mongo awaits, the deadline the expansion and index lookups between them
+        conflicts = await asyncio.wait_for(find_conflicts(event, exclude_id, time.monotonic() + budget), budget)
+    except asyncio.TimeoutError:
+        logger.warning("Conflict check exceeded %.0f ms budget, saving without it", CONFLICT_CHECK_BUDGET_MS)
+        response.headers["X-Conflict-Check"] = "skipped"
+        return
+    response.headers["X-Conflict-Check"] = "passed"
+    if conflicts:
+        raise HTTPException(status_code=409, detail={"message": "Event overlaps existing events", "conflicts": conflicts})
+
+async def refresh_derived_fields(events: List[dict], touch: bool = True):
+    """Store the last occurrence of count rules and the effective range of written events.
+
+    An update may carry only some of the fields these derive from, so this runs on the
+    written documents and writes back only what changed. The documents are patched in place.
+    A document that changes also gets a new updated_at, so an ETag or cached expansion taken
+    between the two writes can't outlive them; touch=False leaves it alone for backfills.
+    """
+    operations = []
+    now = datetime.utcnow().isoformat()
+    for event in events:
+        changes = {}
+        recurrence = event.get("recurrence") or {}
+        if recurrence.get("count") and recurrence.get("type") in RECURRING_TYPES:
+            last_occurrence = count_last_occurrence(wall_start(event), recurrence)
+            if last_occurrence != recurrence.get("last_occurrence"):
+                event["recurrence"] = dict(recurrence, last_occurrence=last_occurrence)
+                changes["recurrence.last_occurrence"] = last_occurrence
+        for field, value in effective_range(event).items():
+            if value != event.get(field):
+                event[field] = changes[field] = value
+        if changes:
+            if touch:
+                event["updated_at"] = changes["updated_at"] = now
+            operations.append(UpdateOne({"_id": event["_id"]}, {"$set": changes}))
+    if operations:
+        await db.events.bulk_write(operations, ordered=False)
+
+async def backfill_effective_range(batch_size: int = 500):
+    """Derive the effective range of events written before it was stored, which range queries would miss.
+
+    Events stored before effective_start existed also get an effective_end in naive UTC.
+    """
+    batch = []
+    async for event in db.events.find({"effective_start": {"$exists": False}}):
+        batch.append(event)
+        if len(batch) >= batch_size:
+            await refresh_derived_fields(batch, touch=False)
+            batch = []
+    if batch:
+        await refresh_derived_fields(batch, touch=False)
+
 # Routes
 @api_router.get("/")
 async def root():
     return {"message": "Bridgerton Calendar API"}
 
 @api_router.post("/events", response_model=Event)
-async def create_event(event: EventCreate):
+async def create_event(event: EventCreate, response: Response, check_conflicts: bool = False):
     event_dict = event.dict()
+    try:
+        event_dict["recurrence"] = checked_recurrence(event_dict["recurrence"], wall_start(event_dict))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid recurrence rule: {e}")
+    event_dict.update(effective_range(event_dict))
+    if check_conflicts:
+        await reject_conflicts(event_dict, response)
     event_dict["created_at"] = datetime.utcnow().isoformat()
     event_dict["updated_at"] = datetime.utcnow().isoformat()
     
-    result = await db.events.insert_one(event_dict)
-    new_event = await db.events.find_one({"_id": result.inserted_id})
-    return event_helper(new_event)
+    # insert_one stores the generated _id on event_dict, so no read-back is needed
+    await db.events.insert_one(event_dict)
+    series_written(event_dict)
+    return event_helper(event_dict)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def compute_etag(events: List[dict], *variant) -> str:
+    """Strong ETag over the (id, updated_at) of every matching document plus the request variant.
+
+    Any write bumps updated_at and a delete drops the document from the set, so the tag
+    changes whenever the response could; documents may arrive in any order.
+    """
+    digest = hashlib.sha1(repr(variant).encode())
+    for version in sorted(f"{event['_id']}:{event.get('updated_at')}" for event in events):
+        digest.update(version.encode())
+    return f'"{digest.hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+async def check_not_modified(query: dict, if_none_match: Optional[str], *variant) -> Optional[Response]:
+    """304 response if the client's ETag still matches, checked with an updated_at-only projection"""
+    if not if_none_match:
+        return None
+    versions = await db.events.find(query, {"updated_at": 1}).to_list(None)
+    etag = compute_etag(versions, *variant)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+def events_response(events: List[dict], headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    """Encode event_helper dicts straight to JSON.
+
+    Returning a Response skips FastAPI's per-item response_model validation; event_helper
+    output is checked against the Event schema in the tests instead.
+    """
+    return ORJSONResponse([event_helper(event) for event in events], headers=headers)
+
+async def stream_events_ndjson(query: dict, start_dt: Optional[datetime], end_dt: Optional[datetime]) -> AsyncIterator[bytes]:
+    """Yield one JSON line per event/occurrence while the Mongo cursor is still being read.
+
+    Series are expanded lazily and bypass the occurrence cache, so neither the wait for a
+    series' first line nor the memory held grows with the width of the window.
+    """
+    async for event in db.events.find(query):
+        occurrences = [event] if start_dt is None else iter_recurring_events(event, start_dt, end_dt)
+        for occurrence in occurrences:
+            yield orjson.dumps(event_helper(occurrence)) + b"\n"
 
 @api_router.get("/events", response_model=List[Event])
-async def get_events(start_date: Optional[str] = None, end_date: Optional[str] = None):
+async def get_events(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                     limit: Optional[int] = Query(None, ge=1, le=1000), cursor: Optional[str] = None,
+                     response_format: str = Query("full", alias="format", pattern="^(full|compact)$"),
+                     accept: Optional[str] = Header(None), if_none_match: Optional[str] = Header(None)):
     query = {}
+    start_dt = end_dt = None
     
     if start_date and end_date:
-        # Get events that overlap with the date range
-        query["start_date"] = {"$lte": end_date}
-        # For events without end_date, use start_date for comparison
-        # For events with end_date, use end_date for comparison
+        # Get events that overlap with the date range, plus recurring series still running
+        query = range_query(start_date, end_date)
+        start_dt = parse_iso(start_date)
+        end_dt = parse_iso(end_date)
+    
+    # Opt-in streaming: occurrences are written as soon as each series is expanded,
+    # without the 1000 document cap or response_model validation of the whole list
+    if accept and NDJSON_MEDIA_TYPE in accept:
+        return StreamingResponse(stream_events_ndjson(query, start_dt, end_dt), media_type=NDJSON_MEDIA_TYPE)
+    
+    paginated = limit is not None or cursor is not None
+    if paginated and not (start_date and end_date):
+        raise HTTPException(status_code=400, detail="start_date and end_date are required for pagination")
+    compact = response_format == "compact"
+    if compact and (paginated or not (start_date and end_date)):
+        raise HTTPException(status_code=400, detail="format=compact needs start_date and end_date and no pagination")
+    after = decode_cursor(cursor) if cursor else None
+    
+    # Conditional GET: unchanged views are answered without expanding anything
+    variant = ("events", start_date, end_date, limit, cursor, response_format)
+    not_modified = await check_not_modified(query, if_none_match, *variant)
+    if not_modified:
+        return not_modified
     
-    events = await db.events.find(query).to_list(1000)
+    events = await db.events.find(query).to_list(None)
+    headers = {"ETag": compute_etag(events, *variant)}
+    
+    # Compact format: each series once, with its occurrence starts as second offsets from
+    # the series start_date; the client rebuilds occurrences (the first one is the original)
+    if compact:
+        series = []
+        for event in events:
+            offsets = occurrence_offsets(event, start_dt, end_dt)
+            if offsets:
+                series.append(dict(event_helper(event), occurrence_offsets=offsets))
+        return ORJSONResponse({"series": series}, headers=headers)
+    
+    # Keyset pagination over the merged, start-ordered occurrences; the next page's
+    # cursor is returned in the X-Next-Cursor header
+    if paginated:
+        page, next_cursor = paginate_occurrences(events, start_dt, end_dt, limit or 100, after)
+        if next_cursor:
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+        return events_response(page, headers=headers)
     
     # If date range specified, expand recurring events
-    if start_date and end_date:
-        start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-        
+    if start_dt is not None:
         expanded_events = []
         for event in events:
-            occurrences = expand_recurring_events(event, start_dt, end_dt)
+            occurrences = occurrence_cache.get_or_expand(event, start_dt, end_dt)
             expanded_events.extend(occurrences)
         
-        return [event_helper(event) for event in expanded_events]
+        return events_response(expanded_events, headers=headers)
     
-    return [event_helper(event) for event in events]
+    return events_response(events, headers=headers)
 
 @api_router.get("/events/day/{date}")
-async def get_events_for_day(date: str):
+async def get_events_for_day(date: str, if_none_match: Optional[str] = Header(None)):
     """Get all events for a specific day"""
     # Parse the date
-    day_start = datetime.fromisoformat(date.replace('Z', '+00:00')).replace(hour=0, minute=0, second=0, microsecond=0)
-    day_end = day_start + timedelta(days=1)
+    day_start = parse_iso(date).replace(hour=0, minute=0, second=0, microsecond=0)
+    # Inclusive upper bound so events starting at the next midnight belong to the next day
+    day_end = day_start + timedelta(days=1) - timedelta(microseconds=1)
     
-    # Query events that fall on this day
-    events = await db.events.find().to_list(1000)
+    # Let Mongo pick the events overlapping this day, then expand recurring series like get_events
+    query = range_query(day_start.isoformat(), day_end.isoformat())
+    variant = ("day", day_start.isoformat())
+    not_modified = await check_not_modified(query, if_none_match, *variant)
+    if not_modified:
+        return not_modified
     
+    events = await db.events.find(query).to_list(None)
     day_events = []
     for event in events:
-        event_start = datetime.fromisoformat(event["start_date"].replace('Z', '+00:00'))
-        event_end = event_start
-        
-        if event.get("end_date"):
-            event_end = datetime.fromisoformat(event["end_date"].replace('Z', '+00:00'))
-        
-        # Check if event overlaps with this day
-        if event_start.date() == day_start.date() or (event_end.date() >= day_start.date() and event_start.date() <= day_start.date()):
-            # Expand recurring events
-            occurrences = expand_recurring_events(event, day_start, day_end)
-            day_events.extend(occurrences)
+        day_events.extend(occurrence_cache.get_or_expand(event, day_start, day_end))
+    
+    return events_response(day_events, headers={"ETag": compute_etag(events, *variant)})
+
+# Bulk routes are registered before /events/{event_id} so "bulk" is never taken for an id
+@api_router.post("/events/bulk", response_model=List[BulkResult])
+async def create_events_bulk(events: List[EventCreate]):
+    """Insert many events in one round-trip, reporting success or failure per item"""
+    now = datetime.utcnow().isoformat()
+    docs = [dict(event.dict(), created_at=now, updated_at=now, _id=ObjectId()) for event in events]
+    if not docs:
+        return []
+    
+    errors = {}
+    for i, doc in enumerate(docs):
+        try:
+            doc["recurrence"] = checked_recurrence(doc["recurrence"], wall_start(doc))
+            doc.update(effective_range(doc))
+        except ValueError as e:
+            errors[i] = f"Invalid recurrence rule: {e}"
+    valid = [i for i in range(len(docs)) if i not in errors]
+    try:
+        if valid:
+            await db.events.insert_many([docs[i] for i in valid], ordered=False)
+    except BulkWriteError as e:
+        errors.update({valid[error["index"]]: error["errmsg"] for error in e.details.get("writeErrors", [])})
+    for i, doc in enumerate(docs):
+        if i not in errors:
+            series_written(doc)
+    
+    return [
+        BulkResult(index=i, id=str(doc["_id"]), status="error", error=errors[i]) if i in errors
+        else BulkResult(index=i, id=str(doc["_id"]), status="created")
+        for i, doc in enumerate(docs)
+    ]
+
+@api_router.patch("/events/bulk", response_model=List[BulkResult])
+async def update_events_bulk(updates: List[EventBulkUpdate]):
+    """Apply many partial updates with a single bulk_write, reporting the outcome per item"""
+    now = datetime.utcnow().isoformat()
+    results: Dict[int, BulkResult] = {}
+    operations = []
+    operation_targets = []
+    
+    for i, item in enumerate(updates):
+        if not ObjectId.is_valid(item.id):
+            results[i] = BulkResult(index=i, id=item.id, status="error", error="Invalid event ID")
+            continue
+        update_data = {k: v for k, v in item.dict(exclude={"id"}).items() if v is not None}
+        if not update_data:
+            results[i] = BulkResult(index=i, id=item.id, status="error", error="No fields to update")
+            continue
+        try:
+            if "recurrence" in update_data:
+                start = update_data.get("start_date")
+                update_data["recurrence"] = checked_recurrence(update_data["recurrence"], start and parse_iso(start))
+        except ValueError as e:
+            results[i] = BulkResult(index=i, id=item.id, status="error", error=f"Invalid recurrence rule: {e}")
+            continue
+        update_data["updated_at"] = now
+        object_id = ObjectId(item.id)
+        operations.append(UpdateOne({"_id": object_id}, {"$set": update_data}))
+        operation_targets.append((i, object_id))
+    
+    if operations:
+        ids = [object_id for _, object_id in operation_targets]
+        existing = {doc["_id"] async for doc in db.events.find({"_id": {"$in": ids}}, {"_id": 1})}
+        await db.events.bulk_write(operations, ordered=False)
+        for i, object_id in operation_targets:
+            found = object_id in existing
+            results[i] = BulkResult(index=i, id=str(object_id), status="updated" if found else "not_found")
+        # One extra read of the touched series keeps the occurrence index exact
+        touched = [event async for event in db.events.find({"_id": {"$in": list(existing)}})]
+        await refresh_derived_fields(touched)
+        for event in touched:
+            series_written(event)
+    
+    return [results[i] for i in range(len(updates))]
+
+@api_router.delete("/events/bulk", response_model=List[BulkResult])
+async def delete_events_bulk(request: EventBulkDelete):
+    """Delete many events with a single delete_many, reporting the outcome per id"""
+    valid_ids = [ObjectId(event_id) for event_id in request.ids if ObjectId.is_valid(event_id)]
+    existing = set()
+    if valid_ids:
+        existing = {doc["_id"] async for doc in db.events.find({"_id": {"$in": valid_ids}}, {"_id": 1})}
+        await db.events.delete_many({"_id": {"$in": list(existing)}})
+        if existing:
+            deleted_at = datetime.utcnow().isoformat()
+            # Upserts, like delete_event, so a concurrent delete of the same ids can't collide
+            await db.event_tombstones.bulk_write([
+                ReplaceOne({"_id": object_id}, tombstone(object_id, deleted_at), upsert=True) for object_id in existing
+            ], ordered=False)
+    
+    results = []
+    for i, event_id in enumerate(request.ids):
+        if not ObjectId.is_valid(event_id):
+            results.append(BulkResult(index=i, id=event_id, status="error", error="Invalid event ID"))
+        elif ObjectId(event_id) in existing:
+            series_deleted(event_id)
+            results.append(BulkResult(index=i, id=event_id, status="deleted"))
+        else:
+            results.append(BulkResult(index=i, id=event_id, status="not_found"))
+    return results
+
+class BusyBlock(BaseModel):
+    start: str
+    end: str
+
+class FreeBusy(BaseModel):
+    start_date: str
+    end_date: str
+    busy: List[BusyBlock]
+
+@api_router.get("/freebusy", response_model=FreeBusy)
+async def get_freebusy(start_date: str, end_date: str):
+    """Merged busy blocks between start_date and end_date, without any event details.
+
+    Floating, offset and zoned events are merged on one naive UTC timeline, so every time
+    in the response is naive UTC.
+    """
+    start_dt = to_utc_naive(parse_iso(start_date))
+    end_dt = to_utc_naive(parse_iso(end_date))
+    if end_dt <= start_dt:
+        raise HTTPException(status_code=400, detail="end_date must be after start_date")
+    
+    intervals = []
+    async for event in db.events.find(range_query(start_dt.isoformat(), end_dt.isoformat())):
+        intervals.extend(utc_busy_intervals(event, start_dt, end_dt))
+    
+    return ORJSONResponse({
+        "start_date": start_dt.isoformat(),
+        "end_date": end_dt.isoformat(),
+        "busy": [{"start": start.isoformat(), "end": end.isoformat()} for start, end in merge_intervals(intervals)],
+    })
+
+class EventChanges(BaseModel):
+    created: List[Event]
+    updated: List[Event]
+    deleted: List[str]
+    sync_token: str
+
+def tombstone(event_id: ObjectId, deleted_at: str) -> dict:
+    return {
+        "_id": event_id,
+        "deleted_at": deleted_at,
+        "expires_at": datetime.utcnow() + timedelta(days=TOMBSTONE_RETENTION_DAYS),
+    }
+
+def encode_sync_token(watermark: str, sent: Iterable[Tuple[str, str]]) -> str:
+    raw = orjson.dumps([watermark, sorted(sent)])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_sync_token(token: str) -> Tuple[str, Set[Tuple[str, str]]]:
+    """(watermark, (id, timestamp) versions above it already sent)"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        watermark, sent = json.loads(raw)
+        datetime.fromisoformat(watermark)
+        return watermark, {(str(event_id), str(timestamp)) for event_id, timestamp in sent}
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+@api_router.get("/events/changes", response_model=EventChanges)
+async def get_changes(since: Optional[str] = None):
+    """Series created, updated or deleted after a sync token; without one, everything as created.
+
+    updated_at is stamped before a write commits, so a write can land with a timestamp older
+    than one a sync already returned. The token's watermark therefore only passes timestamps
+    older than SYNC_TOKEN_LAG, and versions above it are re-read on the next sync and sent
+    only if the token doesn't list them as sent already.
+    """
+    query = {}
+    tombstones = []
+    watermark, sent = "", set()
+    if since:
+        watermark, sent = decode_sync_token(since)
+        horizon = (datetime.utcnow() - timedelta(days=TOMBSTONE_RETENTION_DAYS)).isoformat()
+        if watermark < horizon:
+            raise HTTPException(status_code=410, detail="Sync token expired, do a full sync")
+        query = {"updated_at": {"$gt": watermark}}
+        tombstones = await db.event_tombstones.find({"deleted_at": {"$gt": watermark}}).to_list(None)
+    settled_before = (datetime.utcnow() - SYNC_TOKEN_LAG).isoformat()
+    
+    events = await db.events.find(query).to_list(None)
+    sent_ids = {event_id for event_id, _ in sent}
+    created, updated = [], []
+    for event in events:
+        if (str(event["_id"]), event.get("updated_at") or "") in sent:
+            continue
+        is_new = not since or ((event.get("created_at") or "") > watermark and str(event["_id"]) not in sent_ids)
+        (created if is_new else updated).append(event_helper(event))
+    deleted = [str(t["_id"]) for t in tombstones if (str(t["_id"]), t["deleted_at"]) not in sent]
+    
+    versions = ([(str(e["_id"]), e.get("updated_at") or "") for e in events]
+                + [(str(t["_id"]), t["deleted_at"]) for t in tombstones])
+    settled = [timestamp for _, timestamp in versions if timestamp <= settled_before]
+    watermark = max([watermark] + settled) if since or settled else settled_before
+    return ORJSONResponse({
+        "created": created,
+        "updated": updated,
+        "deleted": deleted,
+        "sync_token": encode_sync_token(watermark, [v for v in versions if v[1] > watermark]),
+    })
+
+class OccurrenceAt(BaseModel):
+    start: str
+    end: str
+    event: Event
+
+@api_router.get("/events/at", response_model=List[OccurrenceAt])
+async def get_events_at(time: str):
+    """Occurrences in progress at a moment, answered from the in-process occurrence index"""
+    moment = parse_iso(time)
+    if not occurrence_index.covers(to_utc_naive(moment), to_utc_naive(moment)):
+        raise HTTPException(status_code=400, detail="time is outside the indexed window")
     
-    return [event_helper(event) for event in day_events]
+    hits = occurrence_index.at(moment)
+    ids = [ObjectId(series_id) for series_id in {series_id for _, _, series_id in hits}]
+    events = {str(event["_id"]): event_helper(event) async for event in db.events.find({"_id": {"$in": ids}})}
+    return ORJSONResponse([
+        {"start": start.isoformat(), "end": end.isoformat(), "event": events[series_id]}
+        for start, end, series_id in hits if series_id in events
+    ])
 
 @api_router.get("/events/{event_id}", response_model=Event)
-async def get_event(event_id: str):
+async def get_event(event_id: str, if_none_match: Optional[str] = Header(None)):
     if not ObjectId.is_valid(event_id):
         raise HTTPException(status_code=400, detail="Invalid event ID")
     
@@ -272,10 +2030,13 @@ async def get_event(event_id: str):
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    return event_helper(event)
+    etag = compute_etag([event], "event")
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return ORJSONResponse(event_helper(event), headers={"ETag": etag})
 
 @api_router.put("/events/{event_id}", response_model=Event)
-async def update_event(event_id: str, event_update: EventUpdate):
+async def update_event(event_id: str, event_update: EventUpdate, response: Response, check_conflicts: bool = False):
     if not ObjectId.is_valid(event_id):
         raise HTTPException(status_code=400, detail="Invalid event ID")
     
@@ -284,17 +2045,33 @@ async def update_event(event_id: str, event_update: EventUpdate):
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
     
+    if "recurrence" in update_data:
+        start = update_data.get("start_date")
+        try:
+            update_data["recurrence"] = checked_recurrence(update_data["recurrence"], start and parse_iso(start))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid recurrence rule: {e}")
+    
+    if check_conflicts:
+        current = await db.events.find_one({"_id": ObjectId(event_id)})
+        if current is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        await reject_conflicts(dict(current, **update_data), response, exclude_id=event_id)
+    
     update_data["updated_at"] = datetime.utcnow().isoformat()
     
-    result = await db.events.update_one(
+    updated_event = await db.events.find_one_and_update(
         {"_id": ObjectId(event_id)},
-        {"$set": update_data}
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.modified_count == 0:
+    if updated_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    updated_event = await db.events.find_one({"_id": ObjectId(event_id)})
+    if {"start_date", "end_date", "recurrence", "tzid"} & update_data.keys():
+        await refresh_derived_fields([updated_event])
+    series_written(updated_event)
     return event_helper(updated_event)
 
 @api_router.delete("/events/{event_id}")
@@ -307,17 +2084,583 @@ async def delete_event(event_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Event not found")
     
+    await db.event_tombstones.replace_one(
+        {"_id": ObjectId(event_id)}, tombstone(ObjectId(event_id), datetime.utcnow().isoformat()), upsert=True)
+    series_deleted(event_id)
     return {"message": "Event deleted successfully"}
 
+async def find_series_occurrence(event_id: str, occurrence_start: str) -> Tuple[dict, str]:
+    """A recurring series and the key (its own ISO form) of one of its real occurrence starts"""
+    if not ObjectId.is_valid(event_id):
+        raise HTTPException(status_code=400, detail="Invalid event ID")
+    event = await db.events.find_one({"_id": ObjectId(event_id)})
+    if event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if (event.get("recurrence") or {}).get("type") not in RECURRING_TYPES:
+        raise HTTPException(status_code=400, detail="Event is not recurring")
+    
+    try:
+        moment = parse_iso(occurrence_start)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid occurrence start")
+    if event.get("tzid"):
+        # Keys are wall-clock rule times. An offset start is matched by instant, since one pushed
+        # out of a DST gap reads later on the clock; a naive one is a wall-clock time already.
+        tzid = event["tzid"]
+        view = wall_clock_view(event)
+        wall = to_wall_clock(moment, tzid)
+        rrule_params = recurrence_params(view, parse_iso(view["start_date"]), wall - MAX_ZONE_SHIFT, wall + MAX_ZONE_SHIFT)
+        walls = list(recurrence_starts(rrule_params, wall - MAX_ZONE_SHIFT, wall + MAX_ZONE_SHIFT)) if rrule_params else []
+        if moment.tzinfo is None:
+            matches = [d for d in walls if d == moment]
+        else:
+            matches = [d for d, local in zip(walls, localize_wall_times(walls, tzid)) if local == moment]
+        if not matches:
+            raise HTTPException(status_code=404, detail="Series has no occurrence at that time")
+        return event, matches[0].isoformat()
+    
+    first_start = parse_iso(event["start_date"])
+    if (moment.tzinfo is None) != (first_start.tzinfo is None):
+        raise HTTPException(status_code=400, detail="Occurrence start must match the series' time zone style")
+    rrule_params = recurrence_params(event, first_start, moment, moment)
+    matches = [d for d in recurrence_starts(rrule_params, moment, moment) if d == moment] if rrule_params else []
+    if not matches:
+        raise HTTPException(status_code=404, detail="Series has no occurrence at that time")
+    return event, matches[0].isoformat()
+
+@api_router.put("/events/{event_id}/occurrences/{occurrence_start}", response_model=Event)
+async def update_occurrence(event_id: str, occurrence_start: str, event_update: EventUpdate):
+    """Override fields of one occurrence, e.g. move it, with a single $set on the series"""
+    event, key = await find_series_occurrence(event_id, occurrence_start)
+    override = {k: v for k, v in event_update.dict(exclude={"recurrence", "reminders", "tzid"}).items() if v is not None}
+    if not override:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    # A zoned series takes either style; naive override dates are wall-clock times in its zone
+    series_aware = parse_iso(event["start_date"]).tzinfo is not None
+    for field in ("start_date", "end_date") if not event.get("tzid") else ():
+        if field in override and (parse_iso(override[field]).tzinfo is not None) != series_aware:
+            raise HTTPException(status_code=400, detail=f"{field} must match the series' time zone style")
+    
+    update = {f"overrides.{key}.{field}": value for field, value in override.items()}
+    update["updated_at"] = datetime.utcnow().isoformat()
+    updated_event = await db.events.find_one_and_update(
+        {"_id": event["_id"]}, {"$set": update, "$pull": {"exdates": key}}, return_document=ReturnDocument.AFTER)
+    if updated_event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    # A moved instance can end after the rest of the series
+    await refresh_derived_fields([updated_event])
+    series_written(updated_event)
+    return event_helper(updated_event)
+
+@api_router.delete("/events/{event_id}/occurrences/{occurrence_start}", response_model=Event)
+async def delete_occurrence(event_id: str, occurrence_start: str):
+    """Cancel one occurrence by adding it to the series' exdates"""
+    event, key = await find_series_occurrence(event_id, occurrence_start)
+    updated_event = await db.events.find_one_and_update(
+        {"_id": event["_id"]},
+        {"$addToSet": {"exdates": key}, "$unset": {f"overrides.{key}": ""},
+         "$set": {"updated_at": datetime.utcnow().isoformat()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated_event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    await refresh_derived_fields([updated_event])
+    series_written(updated_event)
+    return event_helper(updated_event)
+
+# iCalendar (RFC 5545) import/export
+ICS_IMPORT_BATCH_SIZE = int(os.environ.get("ICS_IMPORT_BATCH_SIZE", "500"))
+ICS_MAX_WARNINGS = 50
+ICS_DEFAULTS = {"event_type": "other", "color": "#D4C5F9", "icon": "calendar-sharp"}
+ICS_FREQUENCIES = {"DAILY": "daily", "WEEKLY": "weekly", "MONTHLY": "monthly", "YEARLY": "yearly"}
+ICS_WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+ICS_ORDINAL_WEEKDAY = re.compile(r"([+-]?\d{1,2})(MO|TU|WE|TH|FR|SA|SU)$")
+ICS_DURATION = re.compile(r"([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+ICS_ESCAPED = re.compile(r"\\([\\;,nN])")
+
+class IcsWarnings:
+    """Warnings of one import; only the first ICS_MAX_WARNINGS are kept"""
+
+    def __init__(self):
+        self.kept: List[str] = []
+        self.skipped = 0
+
+    def append(self, warning: str):
+        if len(self.kept) < ICS_MAX_WARNINGS:
+            self.kept.append(warning)
+
+    def skip(self, warning: str):
+        """A VEVENT that could not be imported at all"""
+        self.skipped += 1
+        self.append(warning)
+
+async def iter_ics_physical_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    for line in (buffer + decoder.decode(b"", final=True)).split("\n"):
+        yield line.rstrip("\r")
+
+async def iter_ics_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Unfolded content lines of an iCalendar stream, decoded chunk by chunk"""
+    current: Optional[str] = None
+    async for line in iter_ics_physical_lines(chunks):
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]  # folded continuation
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+def parse_ics_property(line: str) -> Tuple[str, Dict[str, str], str]:
+    """NAME;PARAM=value:VALUE split into its parts; parameter values may be quoted"""
+    if '"' in line.partition(":")[0]:
+        in_quotes = False
+        for split_at, char in enumerate(line):
+            if char == '"':
+                in_quotes = not in_quotes
+            elif char == ":" and not in_quotes:
+                break
+        head, value = line[:split_at], line[split_at + 1:]
+    else:
+        head, _, value = line.partition(":")
+    name, *raw_params = head.split(";")
+    params = {}
+    for param in raw_params:
+        key, _, param_value = param.partition("=")
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+def parse_ics_datetime(value: str, params: Dict[str, str]) -> Tuple[datetime, bool]:
+    """(datetime, is_date) for a DATE or DATE-TIME value; UTC values come back aware, others naive"""
+    value = value.strip()
+    date = datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return date, True
+    moment = date.replace(hour=int(value[9:11]), minute=int(value[11:13]), second=int(value[13:15]))
+    return (moment.replace(tzinfo=timezone.utc) if value.endswith("Z") else moment), False
+
+def parse_ics_duration(value: str) -> timedelta:
+    match = ICS_DURATION.match(value.strip())
+    if match is None:
+        raise ValueError(f"Invalid duration {value!r}")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                         minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -duration if sign == "-" else duration
+
+def unescape_ics_text(value: str) -> str:
+    return ICS_ESCAPED.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+def escape_ics_text(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def match_awareness(value: datetime, like: datetime, tzid: Optional[str] = None) -> datetime:
+    """Give value the same naive/aware flavour as like, so the two can be compared; for a
+    zoned event, where like is a wall-clock time, aware values become wall-clock times too"""
+    if tzid:
+        return to_wall_clock(value, tzid)
+    if like.tzinfo is None:
+        return to_utc_naive(value)
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+def ics_recurrence(value: str, dtstart: datetime, warnings: IcsWarnings, uid: str,
+                   tzid: Optional[str] = None) -> Optional[dict]:
+    """The stored rule for an RRULE value; parts the rule can't express are reported, not guessed"""
+    parts = dict(part.split("=", 1) for part in value.upper().split(";") if "=" in part)
+    rule_type = ICS_FREQUENCIES.get(parts.pop("FREQ", None))
+    if rule_type is None:
+        warnings.append(f"{uid}: unsupported RRULE {value!r}, imported as a single event")
+        return None
+    rule = {"type": rule_type, "interval": int(parts.pop("INTERVAL", 1)), "end_date": None, "days_of_week": None,
+            "count": None, "by_month_day": None, "by_set_pos": None}
+    parts.pop("WKST", None)
+    
+    if "BYMONTHDAY" in parts:
+        rule["by_month_day"] = [int(day) for day in parts.pop("BYMONTHDAY").split(",")]
+    if "BYSETPOS" in parts:
+        rule["by_set_pos"] = [int(pos) for pos in parts.pop("BYSETPOS").split(",")]
+    by_day = parts.pop("BYDAY", None)
+    if by_day and rule_type != "daily":
+        days = by_day.split(",")
+        ordinal = ICS_ORDINAL_WEEKDAY.match(days[0])
+        if all(day in ICS_WEEKDAYS for day in days) and (
+                rule_type == "weekly" or rule["by_month_day"] or rule["by_set_pos"]):
+            rule["days_of_week"] = [ICS_WEEKDAYS.index(day) for day in days]
+        elif rule_type in ("monthly", "yearly") and len(days) == 1 and ordinal and not rule["by_set_pos"]:
+            # "-1FR" (last Friday) is the same as Fridays with set position -1
+            rule["days_of_week"] = [ICS_WEEKDAYS.index(ordinal.group(2))]
+            rule["by_set_pos"] = [int(ordinal.group(1))]
+        else:
+            parts["BYDAY"] = by_day
+    elif by_day:
+        parts["BYDAY"] = by_day
+    
+    if "UNTIL" in parts:
+        rule["end_date"] = match_awareness(parse_ics_datetime(parts.pop("UNTIL"), {})[0], dtstart, tzid).isoformat()
+    if "COUNT" in parts:
+        rule["count"] = int(parts.pop("COUNT"))
+    if parts:
+        warnings.append(f"{uid}: ignored RRULE parts {';'.join(f'{k}={v}' for k, v in parts.items())}")
+    return checked_recurrence(rule, dtstart)
+
+def vevent_to_event(props: Dict[str, List[Tuple[Dict[str, str], str]]], alarms: List[int],
+                    warnings: IcsWarnings) -> dict:
+    """Event document (or, with RECURRENCE-ID, an override of one) for a parsed VEVENT"""
+    def first(name: str) -> Optional[Tuple[Dict[str, str], str]]:
+        values = props.get(name)
+        return values[0] if values else None
+    
+    uid = first("UID")[1] if first("UID") else str(uuid4())
+    start, all_day = parse_ics_datetime(first("DTSTART")[1], first("DTSTART")[0])
+    # TZID times are wall-clock times in that zone; VTIMEZONE bodies are not read, so only
+    # IANA names are understood and anything else stays floating
+    tzid = None if all_day else first("DTSTART")[0].get("TZID")
+    if tzid:
+        try:
+            checked_tzid(tzid)
+        except ValueError:
+            warnings.append(f"{uid}: unknown TZID {tzid!r}, imported as floating time")
+            tzid = None
+    end = None
+    if first("DTEND"):
+        end = match_awareness(parse_ics_datetime(first("DTEND")[1], first("DTEND")[0])[0], start, tzid)
+        if all_day:
+            end = max(end - timedelta(days=1), start)  # DTEND is exclusive, end_date is the last day
+    elif first("DURATION"):
+        end = start + parse_ics_duration(first("DURATION")[1])
+        if all_day:
+            end = max(end - timedelta(days=1), start)
+    
+    event = {
+        "ics_uid": uid,
+        "title": unescape_ics_text(first("SUMMARY")[1]) if first("SUMMARY") else "Untitled",
+        "description": unescape_ics_text(first("DESCRIPTION")[1]) if first("DESCRIPTION") else None,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat() if end else None,
+        "all_day": all_day,
+        **ICS_DEFAULTS,
+        "recurrence": ics_recurrence(first("RRULE")[1], start, warnings, uid, tzid) if first("RRULE") else None,
+        "reminders": [{"minutes_before": minutes, "notification_id": None} for minutes in alarms],
+        "guests": [value[7:] for _, value in props.get("ATTENDEE", []) if value.lower().startswith("mailto:")],
+        "exdates": [],
+        "overrides": {},
+        "tzid": tzid,
+    }
+    for params, value in props.get("EXDATE", []):
+        for exdate in value.split(","):
+            event["exdates"].append(match_awareness(parse_ics_datetime(exdate, params)[0], start, tzid).isoformat())
+    if first("RECURRENCE-ID"):
+        params, value = first("RECURRENCE-ID")
+        event["recurrence_id"] = match_awareness(parse_ics_datetime(value, params)[0], start, tzid).isoformat()
+        event["cancelled"] = bool(first("STATUS")) and first("STATUS")[1].upper() == "CANCELLED"
+    return event
+
+async def iter_vevents(lines: AsyncIterator[str], warnings: IcsWarnings) -> AsyncIterator[dict]:
+    """Event documents for each VEVENT, holding only the component being read in memory"""
+    props: Optional[Dict[str, List[Tuple[Dict[str, str], str]]]] = None
+    alarm: Optional[Dict[str, str]] = None
+    alarms: List[int] = []
+    async for line in lines:
+        name, params, value = parse_ics_property(line)
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            props, alarms = {}, []
+        elif name == "BEGIN" and value.upper() == "VALARM" and props is not None:
+            alarm = {}
+        elif name == "END" and value.upper() == "VALARM" and alarm is not None:
+            trigger = alarm.get("TRIGGER", "")
+            try:
+                lead = -parse_ics_duration(trigger)
+                if lead >= timedelta(0):
+                    alarms.append(int(lead.total_seconds() // 60))
+            except ValueError:
+                pass  # absolute or unparseable triggers have no minutes_before equivalent
+            alarm = None
+        elif name == "END" and value.upper() == "VEVENT" and props is not None:
+            try:
+                yield vevent_to_event(props, alarms, warnings)
+            except (KeyError, TypeError, ValueError) as e:
+                uid = props.get("UID", [({}, "?")])[0][1]
+                warnings.skip(f"{uid}: skipped, {e.__class__.__name__}: {e}")
+            props = None
+        elif alarm is not None:
+            alarm[name] = value
+        elif props is not None:
+            props.setdefault(name, []).append((params, value))
+
+def ics_instance_update(instance: dict) -> UpdateOne:
+    """The write applying one staged RECURRENCE-ID instance to its series"""
+    key = instance["recurrence_id"]
+    # updated_at moves with every instance change, as in update_occurrence/delete_occurrence
+    stamp = {"updated_at": datetime.utcnow().isoformat()}
+    if instance["cancelled"]:
+        update = {"$addToSet": {"exdates": key}, "$set": stamp}
+    else:
+        update = {"$set": dict(stamp, **{f"overrides.{key}.{field}": value
+                                         for field, value in instance["fields"].items()})}
+    return UpdateOne({"ics_uid": instance["ics_uid"], "recurrence": {"$ne": None}}, update)
+
+async def import_ics_stream(chunks: AsyncIterator[bytes]) -> dict:
+    """Insert every VEVENT of an .ics stream in insert_many batches, in memory bounded by the batch.
+
+    UIDs already in the collection are skipped, so re-importing a calendar is harmless.
+    Overridden and cancelled instances (RECURRENCE-ID) may come before their series, so they
+    are staged in Mongo as they are read and applied batch by batch at the end.
+    """
+    warnings = IcsWarnings()
+    summary = {"imported": 0, "duplicates": 0, "overrides": 0, "skipped": 0}
+    import_id = ObjectId()
+    batch: List[dict] = []
+    instances: List[dict] = []
+    
+    async def flush():
+        uids = [doc["ics_uid"] for doc in batch]
+        existing = {doc["ics_uid"] async for doc in db.events.find({"ics_uid": {"$in": uids}}, {"ics_uid": 1})}
+        now = datetime.utcnow().isoformat()
+        docs = [dict(doc, created_at=now, updated_at=now, _id=ObjectId(), **effective_range(doc))
+                for doc in batch if doc["ics_uid"] not in existing]
+        summary["duplicates"] += len(batch) - len(docs)
+        batch.clear()
+        if docs:
+            await db.events.insert_many(docs, ordered=False)
+            for doc in docs:
+                series_written(doc)
+            summary["imported"] += len(docs)
+    
+    async def stage():
+        await db.ics_import_instances.insert_many(instances, ordered=True)
+        instances.clear()
+    
+    async def apply_staged(staged: List[dict]):
+        result = await db.events.bulk_write([ics_instance_update(instance) for instance in staged], ordered=True)
+        summary["overrides"] += result.matched_count
+        uids = list({instance["ics_uid"] for instance in staged})
+        overridden = await db.events.find({"ics_uid": {"$in": uids}}).to_list(None)
+        await refresh_derived_fields(overridden)
+        for event in overridden:
+            series_written(event)
+    
+    try:
+        async for event in iter_vevents(iter_ics_lines(chunks), warnings):
+            if "recurrence_id" in event:
+                fields = {field: event[field] for field in ("title", "description", "start_date", "end_date")
+                          if event[field] is not None}
+                instances.append({"_id": ObjectId(), "import_id": import_id, "ics_uid": event["ics_uid"],
+                                  "recurrence_id": event["recurrence_id"], "cancelled": event["cancelled"],
+                                  "fields": fields})
+                if len(instances) >= ICS_IMPORT_BATCH_SIZE:
+                    await stage()
+                continue
+            batch.append(event)
+            if len(batch) >= ICS_IMPORT_BATCH_SIZE:
+                await flush()
+        if batch:
+            await flush()
+        if instances:
+            await stage()
+        
+        staged: List[dict] = []
+        async for instance in db.ics_import_instances.find({"import_id": import_id}).sort("_id", ASCENDING):
+            staged.append(instance)
+            if len(staged) >= ICS_IMPORT_BATCH_SIZE:
+                await apply_staged(staged)
+                staged = []
+        if staged:
+            await apply_staged(staged)
+    finally:
+        await db.ics_import_instances.delete_many({"import_id": import_id})
+    
+    summary["skipped"] = warnings.skipped
+    summary["warnings"] = warnings.kept
+    return summary
+
+def format_ics_datetime(value: datetime, as_date: bool, tzid: Optional[str] = None) -> Tuple[str, str]:
+    """(parameter suffix, value); zoned times are written as wall-clock times with their TZID,
+    other aware times in UTC, naive ones as floating time"""
+    if as_date:
+        return ";VALUE=DATE", value.strftime("%Y%m%d")
+    if tzid:
+        return f";TZID={tzid}", to_wall_clock(value, tzid).strftime("%Y%m%dT%H%M%S")
+    if value.tzinfo is not None:
+        return "", to_utc_naive(value).strftime("%Y%m%dT%H%M%SZ")
+    return "", value.strftime("%Y%m%dT%H%M%S")
+
+def fold_ics_line(line: str) -> str:
+    """CRLF-terminated content line folded at 75 octets, never inside a UTF-8 sequence"""
+    if len(line.encode()) <= 75:
+        return line + "\r\n"
+    parts, current, size = [], "", 0
+    for char in line:
+        octets = len(char.encode())
+        if size + octets > (74 if parts else 75):
+            parts.append(current)
+            current, size = "", 0
+        current += char
+        size += octets
+    parts.append(current)
+    return "\r\n ".join(parts) + "\r\n"
+
+def ics_rrule(recurrence: dict, all_day: bool, tzid: Optional[str] = None) -> Optional[str]:
+    freq = next((k for k, v in ICS_FREQUENCIES.items() if v == recurrence.get("type")), None)
+    if freq is None:
+        return None
+    parts = [f"FREQ={freq}", f"INTERVAL={recurrence.get('interval', 1)}"]
+    if recurrence.get("end_date"):
+        until = parse_iso(recurrence["end_date"])
+        if tzid:  # UNTIL has to be UTC when DTSTART carries a TZID
+            until = localize_wall_times([to_wall_clock(until, tzid)], tzid)[0]
+        parts.append("UNTIL=" + format_ics_datetime(until, all_day)[1])
+    if recurrence.get("count"):
+        parts.append(f"COUNT={recurrence['count']}")
+    by_parts = rule_by_parts(recurrence)
+    if "byweekday" in by_parts:
+        parts.append("BYDAY=" + ",".join(ICS_WEEKDAYS[day] for day in by_parts["byweekday"]))
+    if "bymonthday" in by_parts:
+        parts.append("BYMONTHDAY=" + ",".join(map(str, by_parts["bymonthday"])))
+    if "bysetpos" in by_parts:
+        parts.append("BYSETPOS=" + ",".join(map(str, by_parts["bysetpos"])))
+    return ";".join(parts)
+
+def event_to_ics(event: dict) -> str:
+    """VEVENT for a series, plus one VEVENT per overridden instance"""
+    uid = event.get("ics_uid") or f"{event['_id']}@bridgerton-calendar"
+    all_day = event.get("all_day", False)
+    tzid = None if all_day else event.get("tzid")
+    start = parse_iso(event["start_date"])
+    end = parse_iso(event["end_date"]) if event.get("end_date") else None
+    duration = end - start if end else None
+    stamp = format_ics_datetime(parse_iso(event.get("updated_at") or datetime.utcnow().isoformat()).replace(tzinfo=timezone.utc), False)[1]
+    
+    def dates(occurrence_start: datetime, occurrence_end: Optional[datetime]) -> List[str]:
+        suffix, value = format_ics_datetime(occurrence_start, all_day, tzid)
+        lines = [f"DTSTART{suffix}:{value}"]
+        if all_day:
+            last_day = occurrence_end or occurrence_start
+            lines.append("DTEND{}:{}".format(*format_ics_datetime(last_day + timedelta(days=1), True)))
+        elif occurrence_end is not None:
+            lines.append("DTEND{}:{}".format(*format_ics_datetime(occurrence_end, False, tzid)))
+        return lines
+    
+    lines = ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{stamp}", *dates(start, end),
+             f"SUMMARY:{escape_ics_text(event['title'])}"]
+    if event.get("description"):
+        lines.append(f"DESCRIPTION:{escape_ics_text(event['description'])}")
+    rule = ics_rrule(event["recurrence"], all_day, tzid) if event.get("recurrence") else None
+    if rule:
+        lines.append(f"RRULE:{rule}")
+        for exdate in event.get("exdates") or ():
+            lines.append("EXDATE{}:{}".format(*format_ics_datetime(parse_iso(exdate), all_day, tzid)))
+    lines.extend(f"ATTENDEE:mailto:{guest}" for guest in event.get("guests") or ())
+    for reminder in event.get("reminders") or ():
+        lines.extend(["BEGIN:VALARM", "ACTION:DISPLAY", f"DESCRIPTION:{escape_ics_text(event['title'])}",
+                      f"TRIGGER:-PT{reminder['minutes_before']}M", "END:VALARM"])
+    lines.append("END:VEVENT")
+    
+    for key, override in (event.get("overrides") or {}).items() if rule else ():
+        original = parse_iso(key)
+        instance_start = parse_iso(override["start_date"]) if override.get("start_date") else original
+        instance_end = parse_iso(override["end_date"]) if override.get("end_date") else (
+            instance_start + duration if duration is not None else None)
+        lines.extend(["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{stamp}",
+                      "RECURRENCE-ID{}:{}".format(*format_ics_datetime(original, all_day, tzid)),
+                      *dates(instance_start, instance_end),
+                      f"SUMMARY:{escape_ics_text(override.get('title') or event['title'])}"])
+        description = override.get("description") or event.get("description")
+        if description:
+            lines.append(f"DESCRIPTION:{escape_ics_text(description)}")
+        lines.append("END:VEVENT")
+    return "".join(fold_ics_line(line) for line in lines)
+
+async def stream_ics(query: dict) -> AsyncIterator[bytes]:
+    """A VCALENDAR written one VEVENT at a time as the Mongo cursor is read"""
+    yield b"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Bridgerton Calendar//EN\r\nCALSCALE:GREGORIAN\r\n"
+    async for event in db.events.find(query):
+        yield event_to_ics(event).encode()
+    yield b"END:VCALENDAR\r\n"
+
+@api_router.post("/import/ics")
+async def import_ics(request: Request):
+    """Import a text/calendar request body, read incrementally rather than buffered whole"""
+    return await import_ics_stream(request.stream())
+
+@api_router.get("/export/ics")
+async def export_ics(start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """Every event, or those touching a date range, as a streamed .ics file"""
+    query = range_query(start_date, end_date) if start_date and end_date else {}
+    return StreamingResponse(stream_ics(query), media_type="text/calendar; charset=utf-8",
+                             headers={"Content-Disposition": 'attachment; filename="calendar.ics"'})
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters and memory use of the recurring occurrence cache"""
+    return occurrence_cache.stats()
+
+@api_router.get("/reminders/stats")
+async def get_reminder_stats():
+    """Size of the reminder queue and delivery counters"""
+    return reminder_scheduler.stats()
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(DebugSamplingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
+)
+
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that passes streamed media types through uncompressed.
+
+    Starlette's gzip stream never flushes zlib between body chunks, so a compressed NDJSON
+    or iCalendar stream would reach the client only once the deflate buffer filled or the
+    response ended.
+    """
+
+    def __init__(self, app, excluded_media_types: Iterable[str] = (), **kwargs):
+        super().__init__(app, **kwargs)
+        self.excluded_media_types = frozenset(excluded_media_types)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "gzip" not in Headers(scope=scope).get("Accept-Encoding", ""):
+            await self.app(scope, receive, send)
+            return
+        
+        async def route_by_media_type(scope, receive, gzip_send):
+            target = gzip_send
+            
+            async def route(message):
+                nonlocal target
+                if message["type"] == "http.response.start":
+                    media_type = Headers(raw=message["headers"]).get("content-type", "").split(";")[0].strip()
+                    if media_type in self.excluded_media_types:
+                        target = send
+                await target(message)
+            
+            await self.app(scope, receive, route)
+        
+        await GZipResponder(route_by_media_type, self.minimum_size, compresslevel=self.compresslevel)(scope, receive, send)
+
+# Expanded ranges repeat the same series fields for every occurrence and compress very well;
+# small responses aren't worth the CPU. Streams go out uncompressed so each line arrives as sent.
+app.add_middleware(
+    StreamAwareGZipMiddleware,
+    excluded_media_types=(NDJSON_MEDIA_TYPE, "text/calendar"),
+    minimum_size=int(os.environ.get("COMPRESSION_MIN_SIZE", "1024")),
+    compresslevel=int(os.environ.get("COMPRESSION_LEVEL", "6")),
 )
 
 # Configure logging
@@ -327,6 +2670,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+reminder_task: Optional[asyncio.Task] = None
+index_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def create_indexes():
+    existing = await db.events.index_information()
+    for name in OBSOLETE_EVENT_INDEXES:
+        if name in existing:
+            await db.events.drop_index(name)
+    await db.events.create_indexes(EVENT_INDEXES)
+    await db.event_tombstones.create_indexes(TOMBSTONE_INDEXES)
+    await backfill_effective_range()
+    await occurrence_index.rebuild()
+
+@app.on_event("startup")
+async def start_index_refresh():
+    global index_task
+    index_task = asyncio.create_task(occurrence_index.run())
+
+@app.on_event("startup")
+async def start_reminder_scheduler():
+    global reminder_task
+    await reminder_scheduler.rebuild()
+    reminder_task = asyncio.create_task(reminder_scheduler.run())
+
+@app.on_event("shutdown")
+async def stop_reminder_scheduler():
+    if reminder_task is not None:
+        reminder_task.cancel()
+    await reminder_scheduler.sink.close()
+
+@app.on_event("shutdown")
+async def stop_index_refresh():
+    if index_task is not None:
+        index_task.cancel()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
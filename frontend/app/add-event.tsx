@@ -95,6 +95,8 @@ export default function AddEventScreen() {
         start_date: startDate.toISOString(),
         end_date: endDate.toISOString(),
         all_day: allDay,
+        // Repeats stay at this wall-clock time across DST changes in the device's zone
+        tzid: Intl.DateTimeFormat().resolvedOptions().timeZone,
         event_type: eventType,
         color: selectedType.color,
         icon: selectedType.icon,
@@ -107,13 +109,31 @@ export default function AddEventScreen() {
         reminders: [],
       };
 
-      const response = await fetch(`${EXPO_PUBLIC_BACKEND_URL}/api/events`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(eventData),
-      });
+      const postEvent = (checkConflicts) =>
+        fetch(`${EXPO_PUBLIC_BACKEND_URL}/api/events?check_conflicts=${checkConflicts}`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify(eventData),
+        });
+
+      let response = await postEvent(true);
+
+      if (response.status === 409) {
+        const { detail } = await response.json();
+        const names = detail.conflicts.map((c) => c.title).join(', ');
+        const saveAnyway = await new Promise((resolve) =>
+          Alert.alert('Time conflict', `This overlaps with: ${names}`, [
+            { text: 'Cancel', style: 'cancel', onPress: () => resolve(false) },
+            { text: 'Save anyway', onPress: () => resolve(true) },
+          ])
+        );
+        if (!saveAnyway) {
+          return;
+        }
+        response = await postEvent(false);
+      }
 
       if (response.ok) {
         const createdEvent = await response.json();
@@ -131,6 +131,8 @@ export default function EditEventScreen() {
         start_date: startDate.toISOString(),
         end_date: endDate.toISOString(),
         all_day: allDay,
+        // Repeats stay at this wall-clock time across DST changes in the device's zone
+        tzid: Intl.DateTimeFormat().resolvedOptions().timeZone,
         event_type: eventType,
         color: selectedType.color,
         icon: selectedType.icon,
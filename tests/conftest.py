@@ -0,0 +1,37 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# server.py reads its Mongo settings at import time; the client connects lazily,
+# so these placeholders are enough for tests that never touch the database.
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "calendar_test")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Swap the module-level Motor database for an in-memory mongomock one"""
+    from mongomock_motor import AsyncMongoMockClient
+    import server
+
+    mock_db = AsyncMongoMockClient()[os.environ["DB_NAME"]]
+    monkeypatch.setattr(server, "db", mock_db)
+    return mock_db
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+
+    monkeypatch.setattr(server, "occurrence_cache", server.OccurrenceCache(server.occurrence_cache.max_bytes))
+    monkeypatch.setattr(server, "occurrence_index", server.OccurrenceIndex(
+        server.occurrence_index.lookback.days, server.occurrence_index.horizon.days))
+    monkeypatch.setattr(server, "reminder_scheduler", server.ReminderScheduler(
+        server.QueueReminderSink(), server.reminder_scheduler.horizon.days))
+    with TestClient(server.app) as test_client:
+        yield test_client
@@ -0,0 +1,1051 @@
+from datetime import datetime, timedelta, timezone
+
+
+def event_payload(title, start, end=None, recurrence=None):
+    return {
+        "title": title,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat() if end else None,
+        "all_day": False,
+        "event_type": "meeting",
+        "color": "#C7B8EA",
+        "icon": "briefcase",
+        "recurrence": recurrence,
+        "reminders": [],
+        "guests": [],
+    }
+
+
+def titles(response):
+    assert response.status_code == 200, response.text
+    return sorted({e["title"] for e in response.json()})
+
+
+def test_range_excludes_events_that_ended_before_window(client):
+    window_start = datetime(2026, 5, 1)
+    window_end = datetime(2026, 5, 31, 23, 59)
+    old = datetime(2023, 1, 10, 9)
+    client.post("/api/events", json=event_payload("old one-off", old, old + timedelta(hours=1)))
+    client.post("/api/events", json=event_payload("old no end", old))
+    client.post("/api/events", json=event_payload("spans window", datetime(2026, 4, 28), datetime(2026, 5, 3)))
+    client.post("/api/events", json=event_payload("inside", datetime(2026, 5, 10, 9)))
+    client.post("/api/events", json=event_payload("future", datetime(2026, 7, 1, 9)))
+    client.post("/api/events", json=event_payload(
+        "open series", old, old + timedelta(hours=1), {"type": "weekly", "interval": 1}))
+    client.post("/api/events", json=event_payload(
+        "finished series", old, old + timedelta(hours=1),
+        {"type": "daily", "interval": 1, "end_date": datetime(2023, 2, 1).isoformat()}))
+
+    response = client.get("/api/events", params={
+        "start_date": window_start.isoformat(), "end_date": window_end.isoformat()})
+    assert titles(response) == ["inside", "open series", "spans window"]
+
+
+def test_indexes_created_on_startup(client, db):
+    import asyncio
+    import server
+
+    names = set(asyncio.run(db.events.index_information()))
+    assert {"effective_end_effective_start", "updated_at", "ics_uid"} <= names
+    assert not names & set(server.OBSOLETE_EVENT_INDEXES)
+
+
+def test_startup_drops_indexes_range_queries_no_longer_use(client, db):
+    import asyncio
+    import server
+
+    async def restart():
+        await db.events.create_index([("start_date", 1), ("end_date", 1)], name="start_date_end_date")
+        await db.events.create_index([("effective_end", 1), ("start_date", 1)], name="effective_end_start_date")
+        await server.create_indexes()
+        return set(await db.events.index_information())
+
+    names = asyncio.run(restart())
+    assert "effective_end_effective_start" in names
+    assert not names & set(server.OBSOLETE_EVENT_INDEXES)
+
+
+def test_day_endpoint_filters_in_mongo_and_expands_series(client):
+    day = datetime(2026, 5, 14)
+    client.post("/api/events", json=event_payload("that day", day.replace(hour=9), day.replace(hour=10)))
+    client.post("/api/events", json=event_payload("day before", day - timedelta(hours=5), day - timedelta(hours=4)))
+    client.post("/api/events", json=event_payload("next midnight", day + timedelta(days=1)))
+    client.post("/api/events", json=event_payload(
+        "multi-day", datetime(2026, 5, 12), datetime(2026, 5, 16)))
+    client.post("/api/events", json=event_payload(
+        "daily series", datetime(2024, 1, 1, 7), datetime(2024, 1, 1, 8), {"type": "daily", "interval": 1}))
+
+    response = client.get(f"/api/events/day/{day.date().isoformat()}")
+    assert titles(response) == ["daily series", "multi-day", "that day"]
+    series = [e for e in response.json() if e["title"] == "daily series"]
+    assert [e["start_date"] for e in series] == ["2026-05-14T07:00:00"]
+
+
+def test_day_endpoint_is_not_capped_at_1000(client, db):
+    import asyncio
+    import server
+
+    docs = [event_payload(f"e{i}", datetime(2026, 5, 14, 9)) for i in range(1200)]
+    asyncio.run(db.events.insert_many([dict(doc, **server.effective_range(doc)) for doc in docs]))
+
+    response = client.get("/api/events/day/2026-05-14")
+    assert len(response.json()) == 1200
+
+
+def test_recurrence_debug_logging_is_sampled_per_request(client, caplog, monkeypatch):
+    import logging
+    import server
+
+    client.post("/api/events", json=event_payload(
+        "daily series", datetime(2026, 5, 1, 7), datetime(2026, 5, 1, 8), {"type": "daily", "interval": 1}))
+    params = {"start_date": "2026-05-01T00:00:00", "end_date": "2026-05-03T23:59:59"}
+
+    monkeypatch.setattr(server, "DEBUG_SAMPLE_RATE", 0.0)
+    with caplog.at_level(logging.DEBUG, logger="server.recurrence"):
+        client.get("/api/events", params=params)
+    assert not caplog.records
+
+    monkeypatch.setattr(server, "DEBUG_SAMPLE_RATE", 1.0)
+    with caplog.at_level(logging.DEBUG, logger="server.recurrence"):
+        client.get("/api/events", params={"start_date": "2026-06-01T00:00:00", "end_date": "2026-06-03T23:59:59"})
+    occurrences = [r for r in caplog.records if r.getMessage().startswith("occurrence ")]
+    assert len(occurrences) == 30  # the whole June bucket is expanded and cached
+    assert len({r.args[0] for r in caplog.records}) == 1  # one trace id for the whole request
+
+
+def test_repeated_range_served_from_occurrence_cache(client):
+    created = client.post("/api/events", json=event_payload(
+        "daily series", datetime(2026, 5, 1, 7), datetime(2026, 5, 1, 8), {"type": "daily", "interval": 1})).json()
+    params = {"start_date": "2026-05-01T00:00:00", "end_date": "2026-05-31T23:59:59"}
+
+    first = client.get("/api/events", params=params).json()
+    second = client.get("/api/events", params=params).json()
+    assert first == second and len(first) == 31
+    assert client.get("/api/cache/stats").json()["hits"] == 1
+
+    client.put(f"/api/events/{created['_id']}", json={"title": "renamed"})
+    assert client.get("/api/cache/stats").json()["entries"] == 0
+    renamed = client.get("/api/events", params=params).json()
+    assert {e["title"] for e in renamed} == {"renamed"}
+
+    client.delete(f"/api/events/{created['_id']}")
+    stats = client.get("/api/cache/stats").json()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 0)
+
+
+def test_windows_a_few_milliseconds_apart_share_cached_occurrences(client):
+    client.post("/api/events", json=event_payload(
+        "daily series", datetime(2026, 5, 1, 7), datetime(2026, 5, 1, 8), {"type": "daily", "interval": 1}))
+
+    first = client.get("/api/events", params={
+        "start_date": "2026-05-04T10:15:02.117Z", "end_date": "2026-05-11T10:15:02.117Z"}).json()
+    second = client.get("/api/events", params={
+        "start_date": "2026-05-04T10:15:03.482Z", "end_date": "2026-05-11T10:15:03.482Z"}).json()
+    assert [e["start_date"] for e in first] == [e["start_date"] for e in second] == [
+        f"2026-05-{day:02d}T07:00:00" for day in range(5, 12)]
+    assert [e["is_recurring_instance"] for e in second] == [False] + [True] * 6
+    stats = client.get("/api/cache/stats").json()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_ndjson_streaming_matches_json_response(client):
+    import json
+
+    client.post("/api/events", json=event_payload("one-off", datetime(2026, 5, 10, 9)))
+    client.post("/api/events", json=event_payload(
+        "daily series", datetime(2026, 5, 1, 7), datetime(2026, 5, 1, 8), {"type": "daily", "interval": 1}))
+    params = {"start_date": "2026-05-01T00:00:00", "end_date": "2026-05-31T23:59:59"}
+
+    expected = client.get("/api/events", params=params).json()
+    cache_stats = client.get("/api/cache/stats").json()
+    response = client.get("/api/events", params=params, headers={"Accept": "application/x-ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert client.get("/api/cache/stats").json() == cache_stats  # streamed past the cache
+    streamed = [json.loads(line) for line in response.text.splitlines()]
+
+    def key(e):
+        return e["start_date"], e["title"]
+    assert sorted(streamed, key=key) == sorted(expected, key=key)
+
+
+def test_cursor_pagination_walks_merged_occurrences_in_order(client):
+    client.post("/api/events", json=event_payload(
+        "daily", datetime(2026, 1, 1, 9), datetime(2026, 1, 1, 10), {"type": "daily", "interval": 1}))
+    client.post("/api/events", json=event_payload(
+        "weekly", datetime(2025, 12, 29, 9), datetime(2025, 12, 29, 10), {"type": "weekly", "interval": 1}))
+    for day in (3, 10, 17):
+        client.post("/api/events", json=event_payload(f"one-off {day}", datetime(2026, 1, day, 12)))
+    params = {"start_date": "2026-01-01T00:00:00", "end_date": "2026-01-31T23:59:59"}
+    expected = client.get("/api/events", params=params).json()
+
+    pages, cursor = [], None
+    while True:
+        response = client.get("/api/events", params=dict(params, limit=7, **({"cursor": cursor} if cursor else {})))
+        assert response.status_code == 200
+        assert len(response.json()) <= 7
+        pages.extend(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    keys = [(e["start_date"], e["_id"]) for e in pages]
+    assert keys == sorted(keys)
+    assert len(pages) == len(expected) == 31 + 4 + 3
+    assert sorted(keys) == sorted((e["start_date"], e["_id"]) for e in expected)
+    assert sorted(e["is_recurring_instance"] for e in pages) == sorted(e["is_recurring_instance"] for e in expected)
+
+
+def test_pagination_rejects_bad_cursor_and_missing_range(client):
+    params = {"start_date": "2026-01-01T00:00:00", "end_date": "2026-01-31T23:59:59"}
+    assert client.get("/api/events", params=dict(params, cursor="not-a-cursor")).status_code == 400
+    assert client.get("/api/events", params={"limit": 10}).status_code == 400
+
+
+def test_lean_responses_conform_to_event_schema(client):
+    from server import Event
+
+    client.post("/api/events", json=dict(event_payload(
+        "daily", datetime(2026, 1, 1, 9), datetime(2026, 1, 1, 10), {"type": "daily", "interval": 2}),
+        description="standup", reminders=[{"minutes_before": 15, "notification_id": "n-1"}],
+        guests=["a@example.com"]))
+    client.post("/api/events", json=event_payload("one-off", datetime(2026, 1, 3, 12)))
+    params = {"start_date": "2026-01-01T00:00:00", "end_date": "2026-01-31T23:59:59"}
+
+    responses = [
+        client.get("/api/events"),
+        client.get("/api/events", params=params),
+        client.get("/api/events", params=dict(params, limit=5)),
+        client.get("/api/events/day/2026-01-03"),
+    ]
+    for response in responses:
+        assert response.status_code == 200
+        for item in response.json():
+            assert Event.model_validate(item).model_dump(by_alias=True) == item
+
+
+def test_bulk_create_update_delete_report_per_item(client):
+    created = client.post("/api/events/bulk", json=[
+        event_payload(f"import {i}", datetime(2026, 2, 1 + i, 9)) for i in range(3)
+    ])
+    assert created.status_code == 200
+    assert [r["status"] for r in created.json()] == ["created"] * 3
+    ids = [r["id"] for r in created.json()]
+
+    updated = client.patch("/api/events/bulk", json=[
+        {"id": ids[0], "title": "renamed"},
+        {"id": "0" * 24, "title": "missing"},
+        {"id": "nope", "title": "bad id"},
+        {"id": ids[1]},
+    ])
+    assert [(r["index"], r["status"]) for r in updated.json()] == [
+        (0, "updated"), (1, "not_found"), (2, "error"), (3, "error")]
+    assert client.get(f"/api/events/{ids[0]}").json()["title"] == "renamed"
+
+    deleted = client.request("DELETE", "/api/events/bulk", json={"ids": [ids[0], ids[2], "0" * 24, "nope"]})
+    assert [r["status"] for r in deleted.json()] == ["deleted", "deleted", "not_found", "error"]
+    assert [e["_id"] for e in client.get("/api/events").json()] == [ids[1]]
+
+
+def test_bulk_delete_overwrites_a_tombstone_left_by_a_concurrent_delete(client, db):
+    import asyncio
+    import server
+
+    ids = [r["id"] for r in client.post("/api/events/bulk", json=[
+        event_payload(f"import {i}", datetime(2026, 2, 1 + i, 9)) for i in range(2)]).json()]
+    # Another bulk delete of the same ids got its tombstone in first
+    asyncio.run(db.event_tombstones.insert_one(server.tombstone(server.ObjectId(ids[0]), "2026-01-01T00:00:00")))
+
+    deleted = client.request("DELETE", "/api/events/bulk", json={"ids": ids})
+    assert deleted.status_code == 200
+    assert [r["status"] for r in deleted.json()] == ["deleted", "deleted"]
+    assert asyncio.run(db.event_tombstones.count_documents({})) == 2
+
+
+def test_writes_return_stored_document_without_read_back(client, db, monkeypatch):
+    async def no_reads(*args, **kwargs):
+        raise AssertionError("write paths should not read the document back")
+    with monkeypatch.context() as m:
+        m.setattr(type(db.events), "find_one", no_reads)
+        created = client.post("/api/events", json=event_payload("meeting", datetime(2026, 3, 2, 9))).json()
+        updated = client.put(f"/api/events/{created['_id']}", json={"title": "moved"}).json()
+    assert updated["title"] == "moved" and updated["_id"] == created["_id"]
+    assert updated["updated_at"] >= created["updated_at"]
+
+    assert client.get(f"/api/events/{created['_id']}").json() == updated
+    assert client.put(f"/api/events/{'0' * 24}", json={"title": "x"}).status_code == 404
+
+
+def test_conditional_get_returns_304_until_something_changes(client):
+    created = client.post("/api/events", json=event_payload(
+        "daily", datetime(2026, 1, 1, 9), datetime(2026, 1, 1, 10), {"type": "daily", "interval": 1})).json()
+    other = client.post("/api/events", json=event_payload("one-off", datetime(2026, 1, 5, 12))).json()
+    params = {"start_date": "2026-01-01T00:00:00", "end_date": "2026-01-31T23:59:59"}
+
+    first = client.get("/api/events", params=params)
+    etag = first.headers["etag"]
+    cached = client.get("/api/events", params=params, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["etag"] == etag and not cached.content
+    other_window = client.get("/api/events", params=dict(params, end_date="2026-01-15T00:00:00"),
+                              headers={"If-None-Match": etag})
+    assert other_window.status_code == 200
+
+    client.put(f"/api/events/{created['_id']}", json={"title": "renamed"})
+    changed = client.get("/api/events", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    etag = changed.headers["etag"]
+
+    client.delete(f"/api/events/{other['_id']}")
+    assert client.get("/api/events", params=params, headers={"If-None-Match": etag}).status_code == 200
+
+    single = client.get(f"/api/events/{created['_id']}")
+    assert client.get(f"/api/events/{created['_id']}",
+                      headers={"If-None-Match": single.headers["etag"]}).status_code == 304
+
+    day = client.get("/api/events/day/2026-01-03")
+    assert client.get("/api/events/day/2026-01-03",
+                      headers={"If-None-Match": day.headers["etag"]}).status_code == 304
+
+
+def test_delta_sync_reports_created_updated_and_deleted_series(client):
+    first = client.post("/api/events", json=event_payload("first", datetime(2026, 4, 1, 9))).json()
+    second = client.post("/api/events", json=event_payload("second", datetime(2026, 4, 2, 9))).json()
+
+    snapshot = client.get("/api/events/changes").json()
+    assert sorted(e["title"] for e in snapshot["created"]) == ["first", "second"]
+    assert snapshot["updated"] == [] and snapshot["deleted"] == []
+    token = snapshot["sync_token"]
+
+    unchanged = client.get("/api/events/changes", params={"since": token}).json()
+    assert (unchanged["created"], unchanged["updated"], unchanged["deleted"]) == ([], [], [])
+    assert unchanged["sync_token"] == token
+
+    client.put(f"/api/events/{first['_id']}", json={"title": "first, moved"})
+    client.delete(f"/api/events/{second['_id']}")
+    third = client.post("/api/events", json=event_payload("third", datetime(2026, 4, 3, 9))).json()
+
+    delta = client.get("/api/events/changes", params={"since": token}).json()
+    assert [e["_id"] for e in delta["created"]] == [third["_id"]]
+    assert [e["title"] for e in delta["updated"]] == ["first, moved"]
+    assert delta["deleted"] == [second["_id"]]
+
+    caught_up = client.get("/api/events/changes", params={"since": delta["sync_token"]}).json()
+    assert (caught_up["created"], caught_up["updated"], caught_up["deleted"]) == ([], [], [])
+
+
+def test_delta_sync_picks_up_writes_committed_after_a_later_stamped_one(client, db):
+    import asyncio
+
+    client.post("/api/events", json=event_payload("early", datetime(2026, 4, 1, 9)))
+    token = client.get("/api/events/changes").json()["sync_token"]
+
+    # Stamped before the sync above read the collection, but only committed after it
+    stamp = (datetime.utcnow() - timedelta(seconds=1)).isoformat()
+    late = dict(event_payload("late", datetime(2026, 4, 2, 9)), created_at=stamp, updated_at=stamp)
+    asyncio.run(db.events.insert_one(late))
+
+    delta = client.get("/api/events/changes", params={"since": token}).json()
+    assert [e["title"] for e in delta["created"]] == ["late"] and delta["updated"] == []
+    caught_up = client.get("/api/events/changes", params={"since": delta["sync_token"]}).json()
+    assert (caught_up["created"], caught_up["updated"], caught_up["deleted"]) == ([], [], [])
+
+
+def test_delta_sync_rejects_bad_and_expired_tokens(client):
+    import base64
+    import server
+
+    assert client.get("/api/events/changes", params={"since": "%%%"}).status_code == 400
+    bare_timestamp = base64.urlsafe_b64encode(b"2026-01-01T00:00:00").decode()
+    assert client.get("/api/events/changes", params={"since": bare_timestamp}).status_code == 400
+    expired = server.encode_sync_token("2001-01-01T00:00:00", [])
+    assert client.get("/api/events/changes", params={"since": expired}).status_code == 410
+
+
+def test_ndjson_stream_is_not_held_back_by_gzip(client):
+    import json
+
+    client.post("/api/events", json=event_payload(
+        "daily", datetime(2026, 1, 1, 9), datetime(2026, 1, 1, 10), {"type": "daily", "interval": 1}))
+    params = {"start_date": "2026-01-01T00:00:00", "end_date": "2026-12-31T23:59:59"}
+
+    with client.stream("GET", "/api/events", params=params,
+                       headers={"Accept": "application/x-ndjson", "Accept-Encoding": "gzip"}) as response:
+        assert "content-encoding" not in response.headers
+        first = next(response.iter_lines())
+    assert json.loads(first)["start_date"] == "2026-01-01T09:00:00"
+
+    export = client.get("/api/export/ics", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in export.headers and export.text.startswith("BEGIN:VCALENDAR")
+
+
+def test_large_responses_are_gzipped_small_ones_are_not(client):
+    client.post("/api/events", json=event_payload(
+        "daily", datetime(2026, 1, 1, 9), datetime(2026, 1, 1, 10), {"type": "daily", "interval": 1}))
+    params = {"start_date": "2026-01-01T00:00:00", "end_date": "2026-12-31T23:59:59"}
+
+    large = client.get("/api/events", params=params, headers={"Accept-Encoding": "gzip"})
+    assert large.headers["content-encoding"] == "gzip"
+    assert len(large.json()) == 365
+
+    small = client.get("/api/", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+
+def test_compact_format_expands_to_the_full_response(client):
+    client.post("/api/events", json=event_payload(
+        "daily", datetime(2025, 6, 1, 9), datetime(2025, 6, 1, 10), {"type": "daily", "interval": 1}))
+    client.post("/api/events", json=event_payload(
+        "weekly", datetime(2026, 1, 5, 18), None, {"type": "weekly", "interval": 2, "days_of_week": [0, 3]}))
+    client.post("/api/events", json=event_payload("one-off", datetime(2026, 1, 9, 12), datetime(2026, 1, 9, 13)))
+    params = {"start_date": "2026-01-01T00:00:00", "end_date": "2026-02-28T23:59:59"}
+
+    full = client.get("/api/events", params=params).json()
+    compact = client.get("/api/events", params=dict(params, format="compact")).json()
+
+    rebuilt = []
+    for series in compact["series"]:
+        start = datetime.fromisoformat(series["start_date"])
+        for offset in series["occurrence_offsets"]:
+            rebuilt.append((series["_id"], (start + timedelta(seconds=offset)).isoformat()))
+    assert sorted(rebuilt) == sorted((e["_id"], e["start_date"]) for e in full)
+    assert len(compact["series"]) == 3
+
+    assert client.get("/api/events", params={"format": "compact"}).status_code == 400
+    assert client.get("/api/events", params=dict(params, format="bogus")).status_code == 422
+
+
+def test_freebusy_merges_overlapping_occurrences(client):
+    client.post("/api/events", json=event_payload("a", datetime(2026, 3, 2, 9), datetime(2026, 3, 2, 10)))
+    client.post("/api/events", json=event_payload("b", datetime(2026, 3, 2, 9, 30), datetime(2026, 3, 2, 11)))
+    client.post("/api/events", json=event_payload("touching", datetime(2026, 3, 2, 11), datetime(2026, 3, 2, 12)))
+    client.post("/api/events", json=event_payload("no end", datetime(2026, 3, 2, 15)))
+    client.post("/api/events", json=dict(event_payload("holiday", datetime(2026, 3, 4, 10)), all_day=True))
+    client.post("/api/events", json=event_payload(
+        "nightly", datetime(2026, 2, 1, 23), datetime(2026, 2, 2, 1), {"type": "daily", "interval": 1}))
+
+    response = client.get("/api/freebusy", params={
+        "start_date": "2026-03-02T00:00:00", "end_date": "2026-03-05T00:00:00"})
+    assert response.status_code == 200
+    busy = [(b["start"], b["end"]) for b in response.json()["busy"]]
+    assert busy == [
+        ("2026-03-02T00:00:00", "2026-03-02T01:00:00"),  # previous night's occurrence, clipped
+        ("2026-03-02T09:00:00", "2026-03-02T12:00:00"),
+        ("2026-03-02T23:00:00", "2026-03-03T01:00:00"),
+        ("2026-03-03T23:00:00", "2026-03-05T00:00:00"),  # nightly runs into the all-day holiday
+    ]
+    assert client.get("/api/freebusy", params={
+        "start_date": "2026-03-05T00:00:00", "end_date": "2026-03-02T00:00:00"}).status_code == 400
+
+    # Floating and offset events share one naive UTC timeline
+    berlin = timezone(timedelta(hours=1))
+    client.post("/api/events", json=event_payload("floating", datetime(2026, 3, 6, 10), datetime(2026, 3, 6, 11)))
+    client.post("/api/events", json=event_payload(
+        "offset", datetime(2026, 3, 6, 11, 30, tzinfo=berlin), datetime(2026, 3, 6, 13, 30, tzinfo=berlin)))
+    mixed = client.get("/api/freebusy", params={
+        "start_date": "2026-03-06T00:00:00Z", "end_date": "2026-03-07T00:00:00Z"})
+    assert mixed.status_code == 200
+    assert mixed.json()["start_date"] == "2026-03-06T00:00:00"
+    assert [(b["start"], b["end"]) for b in mixed.json()["busy"]] == [
+        ("2026-03-06T00:00:00", "2026-03-06T01:00:00"),
+        ("2026-03-06T10:00:00", "2026-03-06T12:30:00"),
+        ("2026-03-06T23:00:00", "2026-03-07T00:00:00"),
+    ]
+
+
+def test_events_at_follows_creates_updates_and_deletes(client):
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    standup = client.post("/api/events", json=event_payload(
+        "standup", today - timedelta(days=30, hours=-9), today - timedelta(days=30, hours=-10),
+        {"type": "daily", "interval": 1})).json()
+    review = client.post("/api/events", json=event_payload(
+        "review", today + timedelta(days=2, hours=9, minutes=30), today + timedelta(days=2, hours=11))).json()
+
+    def on_at(moment):
+        response = client.get("/api/events/at", params={"time": moment.isoformat()})
+        assert response.status_code == 200, response.text
+        return sorted((o["event"]["title"], o["start"]) for o in response.json())
+
+    overlap = today + timedelta(days=2, hours=9, minutes=45)
+    assert on_at(overlap) == [
+        ("review", (today + timedelta(days=2, hours=9, minutes=30)).isoformat()),
+        ("standup", (today + timedelta(days=2, hours=9)).isoformat()),
+    ]
+    assert on_at(today + timedelta(days=2, hours=10)) == [
+        ("review", (today + timedelta(days=2, hours=9, minutes=30)).isoformat())]
+
+    client.put(f"/api/events/{review['_id']}", json={"start_date": (today + timedelta(days=3, hours=9)).isoformat(),
+                                                      "end_date": (today + timedelta(days=3, hours=10)).isoformat()})
+    assert [title for title, _ in on_at(overlap)] == ["standup"]
+    client.delete(f"/api/events/{standup['_id']}")
+    assert on_at(overlap) == []
+    assert client.get("/api/events/at", params={"time": (today + timedelta(days=3000)).isoformat()}).status_code == 400
+
+
+def test_index_rebuild_keeps_serving_and_keeps_writes_made_meanwhile(client, db, monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    import server
+
+    slot = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1, hours=9)
+    kept = client.post("/api/events", json=event_payload("kept", slot, slot + timedelta(hours=1))).json()
+    dropped = client.post("/api/events", json=event_payload(
+        "dropped", slot + timedelta(hours=2), slot + timedelta(hours=3))).json()
+    index = server.occurrence_index
+
+    class PausingEvents:
+        """Collection whose cursors stop before the first document until resumed"""
+
+        def __init__(self):
+            self.paused, self.resume = asyncio.Event(), asyncio.Event()
+
+        async def find(self, *args, **kwargs):
+            async for event in db.events.find(*args, **kwargs):
+                self.paused.set()
+                await self.resume.wait()
+                yield event
+
+    async def scenario():
+        events = PausingEvents()
+        monkeypatch.setattr(server, "db", SimpleNamespace(events=events))
+        rebuild = asyncio.create_task(index.rebuild())
+        await events.paused.wait()
+        # Mid-rebuild the old index still answers, summaries included
+        conflicts = await server.find_conflicts(
+            {"start_date": slot.isoformat(), "end_date": (slot + timedelta(minutes=30)).isoformat()})
+        assert [c["title"] for c in conflicts] == ["kept"]
+        index.remove_series(dropped["_id"])
+        index.add_series({"_id": "added", "title": "added", "start_date": (slot + timedelta(hours=4)).isoformat(),
+                          "end_date": (slot + timedelta(hours=5)).isoformat()})
+        events.resume.set()
+        await rebuild
+
+    asyncio.run(scenario())
+    assert [key for _, _, key in index.overlapping(slot, slot + timedelta(hours=6))] == [kept["_id"], "added"]
+    assert set(index.summaries) == {kept["_id"], "added"}
+
+
+def test_stale_index_is_rebuilt_in_the_background_not_in_requests(client, monkeypatch):
+    import asyncio
+    import server
+
+    index = server.occurrence_index
+    rebuild, rebuilds = index.rebuild, []
+
+    async def counting_rebuild():
+        rebuilds.append(datetime.utcnow())
+        await rebuild()
+
+    monkeypatch.setattr(index, "rebuild", counting_rebuild)
+    monkeypatch.setattr(index, "is_stale", lambda: True)
+    assert client.get("/api/events/at", params={"time": datetime.utcnow().isoformat()}).status_code == 200
+    assert rebuilds == []
+
+    async def run_briefly():
+        refresh = asyncio.create_task(index.run(check_every=0.01))
+        await asyncio.sleep(0.1)
+        refresh.cancel()
+
+    asyncio.run(run_briefly())
+    assert rebuilds
+
+
+def test_check_conflicts_reports_overlaps_from_index_and_mongo(client):
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    standup = client.post("/api/events", json=event_payload(
+        "standup", today - timedelta(days=30, hours=-9), today - timedelta(days=30, hours=-10),
+        {"type": "daily", "interval": 1})).json()
+    client.post("/api/events", json=dict(event_payload("holiday", today + timedelta(days=7)), all_day=True))
+
+    def create(payload):
+        return client.post("/api/events", params={"check_conflicts": "true"}, json=payload)
+
+    # Inside the occurrence index window
+    clash = create(event_payload("1:1", today + timedelta(days=7, hours=9, minutes=30),
+                                 today + timedelta(days=7, hours=10, minutes=30)))
+    assert clash.status_code == 409
+    [conflict] = clash.json()["detail"]["conflicts"]
+    assert (conflict["_id"], conflict["start"]) == (standup["_id"], (today + timedelta(days=7, hours=9)).isoformat())
+    free = create(event_payload("lunch", today + timedelta(days=7, hours=12), today + timedelta(days=7, hours=13)))
+    assert free.status_code == 200 and free.headers["X-Conflict-Check"] == "passed"
+    series = create(event_payload("gym", today + timedelta(days=1, hours=12, minutes=30),
+                                  today + timedelta(days=1, hours=13), {"type": "daily", "interval": 1}))
+    assert series.status_code == 409
+    assert series.json()["detail"]["conflicts"][0]["title"] == "lunch"
+
+    # Far outside it, answered by the range query
+    past = datetime(2024, 3, 4)
+    client.post("/api/events", json=event_payload("old meeting", past.replace(hour=14), past.replace(hour=15)))
+    assert create(event_payload("old clash", past.replace(hour=14, minute=30),
+                                past.replace(hour=16))).status_code == 409
+
+    # Updates ignore the event's own occurrences and are not saved on conflict
+    moved = client.put(f"/api/events/{free.json()['_id']}", params={"check_conflicts": "true"}, json={
+        "start_date": (today + timedelta(days=14, hours=9)).isoformat(),
+        "end_date": (today + timedelta(days=14, hours=10)).isoformat()})
+    assert moved.status_code == 409
+    assert client.put(f"/api/events/{free.json()['_id']}", params={"check_conflicts": "true"}, json={
+        "title": "long lunch", "end_date": (today + timedelta(days=7, hours=14)).isoformat()}).status_code == 200
+    assert client.get(f"/api/events/{free.json()['_id']}").json()["start_date"] == \
+        (today + timedelta(days=7, hours=12)).isoformat()
+
+
+def test_conflict_check_budget_also_bounds_the_index_path(client, monkeypatch):
+    import time
+    import server
+
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    client.post("/api/events", json=event_payload("lunch", today + timedelta(days=2, hours=12),
+                                                  today + timedelta(days=2, hours=13)))
+    overlapping = server.occurrence_index.overlapping
+
+    def slow_overlapping(start, end):
+        time.sleep(0.002)
+        return overlapping(start, end)
+
+    # The index path never awaits, so only the deadline checks can stop it
+    monkeypatch.setattr(server.occurrence_index, "overlapping", slow_overlapping)
+    monkeypatch.setattr(server, "CONFLICT_CHECK_BUDGET_MS", 20)
+    response = client.post("/api/events", params={"check_conflicts": "true"}, json=event_payload(
+        "gym", today + timedelta(days=1, hours=12), today + timedelta(days=1, hours=13), {"type": "daily", "interval": 1}))
+    assert response.status_code == 200 and response.headers["X-Conflict-Check"] == "skipped"
+
+
+def test_reminder_is_delivered_to_sink_after_create(client):
+    import time
+    import server
+
+    start = datetime.utcnow() + timedelta(minutes=1, seconds=1)
+    created = client.post("/api/events", json=dict(
+        event_payload("call", start, start + timedelta(minutes=30)), reminders=[{"minutes_before": 1}])).json()
+    assert client.get("/api/reminders/stats").json()["series"] == 1
+
+    deadline = time.monotonic() + 5
+    while client.get("/api/reminders/stats").json()["delivered"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    reminder = server.reminder_scheduler.sink.queue.get_nowait()
+    assert (reminder["event_id"], reminder["minutes_before"]) == (created["_id"], 1)
+    assert reminder["occurrence_start"] == start.isoformat()
+
+
+def test_occurrence_overrides_and_exdates(client):
+    series = client.post("/api/events", json=event_payload(
+        "standup", datetime(2026, 4, 1, 9), datetime(2026, 4, 1, 9, 15), {"type": "daily", "interval": 1})).json()
+    url = f"/api/events/{series['_id']}/occurrences"
+
+    moved = client.put(f"{url}/2026-04-03T09:00:00", json={"start_date": "2026-04-03T15:00:00",
+                                                           "end_date": "2026-04-03T16:00:00"})
+    assert moved.status_code == 200, moved.text
+    assert client.put(f"{url}/2026-04-04T09:00:00", json={"title": "retro"}).status_code == 200
+    assert client.put(f"{url}/2026-04-06T09:00:00", json={"start_date": "2026-05-01T12:00:00"}).status_code == 200
+    assert client.put(f"{url}/2026-03-30T12:00:00", json={"start_date": "2026-05-01T12:00:00"}).status_code == 404
+    cancelled = client.delete(f"{url}/2026-04-05T09:00:00")
+    assert cancelled.json()["exdates"] == ["2026-04-05T09:00:00"]
+
+    occurrences = client.get("/api/events", params={
+        "start_date": "2026-04-01T00:00:00", "end_date": "2026-04-07T23:59:59"}).json()
+    assert [(o["title"], o["start_date"], o["end_date"], o["original_start_date"]) for o in occurrences] == [
+        ("standup", "2026-04-01T09:00:00", "2026-04-01T09:15:00", None),
+        ("standup", "2026-04-02T09:00:00", "2026-04-02T09:15:00", None),
+        ("standup", "2026-04-03T15:00:00", "2026-04-03T16:00:00", "2026-04-03T09:00:00"),
+        ("retro", "2026-04-04T09:00:00", "2026-04-04T09:15:00", "2026-04-04T09:00:00"),
+        ("standup", "2026-04-07T09:00:00", "2026-04-07T09:15:00", None),
+    ]
+    assert all("overrides" not in o or not o["overrides"] for o in occurrences[1:])
+
+    # The moved-out instance turns up at its new time, in start order
+    may_first = client.get("/api/events", params={
+        "start_date": "2026-05-01T00:00:00", "end_date": "2026-05-01T23:59:59"}).json()
+    assert [(o["start_date"], o["end_date"]) for o in may_first] == [
+        ("2026-05-01T09:00:00", "2026-05-01T09:15:00"), ("2026-05-01T12:00:00", "2026-05-01T12:15:00")]
+    busy = client.get("/api/freebusy", params={
+        "start_date": "2026-04-03T00:00:00", "end_date": "2026-04-06T00:00:00"}).json()["busy"]
+    assert [(b["start"], b["end"]) for b in busy] == [
+        ("2026-04-03T15:00:00", "2026-04-03T16:00:00"), ("2026-04-04T09:00:00", "2026-04-04T09:15:00")]
+
+    # Cancelling a moved instance drops its override
+    client.delete(f"{url}/2026-04-03T09:00:00")
+    assert "2026-04-03T09:00:00" not in client.get(f"/api/events/{series['_id']}").json()["overrides"]
+
+
+SAMPLE_ICS = "\r\n".join([
+    "BEGIN:VCALENDAR",
+    "VERSION:2.0",
+    "BEGIN:VTIMEZONE",
+    "TZID:Europe/London",
+    "END:VTIMEZONE",
+    "BEGIN:VEVENT",
+    "UID:standup@example.com",
+    "DTSTART:20260406T090000Z",
+    "DURATION:PT15M",
+    "SUMMARY:Stand\\, up",
+    "DESCRIPTION:Line one\\nline two with a long tail that has to be folded across more than one physical l",
+    " ine",
+    "RRULE:FREQ=WEEKLY;BYDAY=MO,WE;COUNT=4",
+    "EXDATE:20260408T090000Z",
+    "BEGIN:VALARM",
+    "TRIGGER:-PT10M",
+    "ACTION:DISPLAY",
+    "END:VALARM",
+    "END:VEVENT",
+    "BEGIN:VEVENT",
+    "UID:standup@example.com",
+    "RECURRENCE-ID:20260413T090000Z",
+    "DTSTART:20260413T100000Z",
+    "DTEND:20260413T103000Z",
+    "SUMMARY:Late standup",
+    "END:VEVENT",
+    "BEGIN:VEVENT",
+    "UID:holiday@example.com",
+    "DTSTART;VALUE=DATE:20260501",
+    "DTEND;VALUE=DATE:20260504",
+    "SUMMARY:Long weekend",
+    "ATTENDEE;CN=\"Doe: Jane\":mailto:jane@example.com",
+    "RRULE:FREQ=YEARLY;BYWEEKNO=18",
+    "END:VEVENT",
+    "BEGIN:VEVENT",
+    "UID:broken@example.com",
+    "SUMMARY:No start",
+    "END:VEVENT",
+    "END:VCALENDAR",
+]) + "\r\n"
+
+
+def test_ics_import_maps_rules_exceptions_and_alarms(client):
+    def chunks():
+        data = SAMPLE_ICS.encode()
+        for i in range(0, len(data), 7):  # split across lines, folds and CRLFs
+            yield data[i:i + 7]
+
+    summary = client.post("/api/import/ics", content=chunks(), headers={"Content-Type": "text/calendar"}).json()
+    assert (summary["imported"], summary["overrides"], summary["skipped"]) == (2, 1, 1)
+    assert any("BYWEEKNO=18" in warning for warning in summary["warnings"])
+    assert client.post("/api/import/ics", content=SAMPLE_ICS.encode()).json()["duplicates"] == 2
+
+    events = {e["title"]: e for e in client.get("/api/events").json()}
+    standup = events["Stand, up"]
+    assert standup["description"].startswith("Line one\nline two") and standup["description"].endswith("line")
+    assert standup["recurrence"]["days_of_week"] == [0, 2]
+    assert (standup["recurrence"]["count"], standup["recurrence"]["last_occurrence"]) == (4, "2026-04-15T09:00:00+00:00")
+    assert standup["reminders"] == [{"minutes_before": 10, "notification_id": None}]
+    occurrences = client.get("/api/events", params={
+        "start_date": "2026-04-01T00:00:00Z", "end_date": "2026-04-30T00:00:00Z"}).json()
+    assert [(o["title"], o["start_date"]) for o in occurrences if o["_id"] == standup["_id"]] == [
+        ("Stand, up", "2026-04-06T09:00:00+00:00"),
+        ("Late standup", "2026-04-13T10:00:00+00:00"),
+        ("Stand, up", "2026-04-15T09:00:00+00:00"),
+    ]
+    holiday = events["Long weekend"]
+    assert (holiday["all_day"], holiday["start_date"], holiday["end_date"]) == (
+        True, "2026-05-01T00:00:00", "2026-05-03T00:00:00")
+    assert holiday["guests"] == ["jane@example.com"]
+
+
+def test_ics_instance_import_changes_the_etag_of_its_series(client):
+    def calendar(*lines):
+        return "\r\n".join(["BEGIN:VCALENDAR", "VERSION:2.0", *lines, "END:VCALENDAR"]).encode()
+
+    client.post("/api/import/ics", content=calendar(
+        "BEGIN:VEVENT", "UID:daily@example.com", "DTSTART:20260406T090000", "DURATION:PT15M",
+        "SUMMARY:Standup", "RRULE:FREQ=DAILY", "END:VEVENT"))
+    params = {"start_date": "2026-04-06T00:00:00", "end_date": "2026-04-08T23:59:59"}
+    etag = client.get("/api/events", params=params).headers["etag"]
+
+    summary = client.post("/api/import/ics", content=calendar(
+        "BEGIN:VEVENT", "UID:daily@example.com", "RECURRENCE-ID:20260407T090000",
+        "DTSTART:20260407T100000", "SUMMARY:Moved", "END:VEVENT")).json()
+    assert summary["overrides"] == 1
+    moved = client.get("/api/events", params=params, headers={"If-None-Match": etag})
+    assert moved.status_code == 200
+    assert [e["title"] for e in moved.json()] == ["Standup", "Moved", "Standup"]
+
+    client.post("/api/import/ics", content=calendar(
+        "BEGIN:VEVENT", "UID:daily@example.com", "RECURRENCE-ID:20260408T090000",
+        "DTSTART:20260408T090000", "STATUS:CANCELLED", "SUMMARY:Standup", "END:VEVENT"))
+    cancelled = client.get("/api/events", params=params, headers={"If-None-Match": moved.headers["etag"]})
+    assert cancelled.status_code == 200 and [e["title"] for e in cancelled.json()] == ["Standup", "Moved"]
+
+
+def test_ics_import_stages_instances_in_batches_and_bounds_warnings(client, db, monkeypatch):
+    import asyncio
+    import server
+
+    monkeypatch.setattr(server, "ICS_IMPORT_BATCH_SIZE", 2)
+    staged_batches = []
+    insert_many = type(db.ics_import_instances).insert_many
+
+    async def recording_insert_many(self, documents, *args, **kwargs):
+        if self.name == "ics_import_instances":
+            staged_batches.append(len(documents))
+        return await insert_many(self, documents, *args, **kwargs)
+
+    monkeypatch.setattr(type(db.ics_import_instances), "insert_many", recording_insert_many)
+    moved = [["BEGIN:VEVENT", "UID:daily@example.com", f"RECURRENCE-ID:2026040{day}T090000",
+              f"DTSTART:2026040{day}T100000", f"SUMMARY:Moved {day}", "END:VEVENT"] for day in range(6, 9)]
+    broken = [["BEGIN:VEVENT", f"UID:broken-{i}@example.com", "SUMMARY:No start", "END:VEVENT"]
+              for i in range(server.ICS_MAX_WARNINGS + 5)]
+    lines = [line for component in moved for line in component] + [
+        "BEGIN:VEVENT", "UID:daily@example.com", "DTSTART:20260406T090000", "DURATION:PT15M",
+        "SUMMARY:Standup", "RRULE:FREQ=DAILY", "END:VEVENT"] + [line for component in broken for line in component]
+    calendar = "\r\n".join(["BEGIN:VCALENDAR", "VERSION:2.0", *lines, "END:VCALENDAR"])
+
+    summary = client.post("/api/import/ics", content=calendar.encode()).json()
+    assert (summary["imported"], summary["overrides"], summary["skipped"]) == (1, 3, server.ICS_MAX_WARNINGS + 5)
+    assert len(summary["warnings"]) == server.ICS_MAX_WARNINGS
+    assert staged_batches == [2, 1]  # the instances came before their series and waited in Mongo
+    assert asyncio.run(db.ics_import_instances.count_documents({})) == 0
+
+    occurrences = client.get("/api/events", params={"start_date": "2026-04-06T00:00:00", "end_date": "2026-04-09T23:59:59"})
+    assert titles(occurrences) == ["Moved 6", "Moved 7", "Moved 8", "Standup"]
+    assert {e["event_type"] for e in occurrences.json()} == {"other"}
+
+
+def test_ics_export_round_trips_through_import(client, db):
+    import asyncio
+
+    series = client.post("/api/events", json=dict(event_payload(
+        "Café; planning, weekly " + "x" * 80, datetime(2026, 6, 1, 9), datetime(2026, 6, 1, 10),
+        {"type": "weekly", "interval": 2, "days_of_week": [0, 3], "end_date": "2026-08-01T00:00:00"}),
+        reminders=[{"minutes_before": 30}])).json()
+    client.put(f"/api/events/{series['_id']}/occurrences/2026-06-04T09:00:00", json={"title": "moved"})
+    client.delete(f"/api/events/{series['_id']}/occurrences/2026-06-15T09:00:00")
+    client.post("/api/events", json=dict(event_payload("trip", datetime(2026, 7, 1), datetime(2026, 7, 3)), all_day=True))
+    params = {"start_date": "2026-06-01T00:00:00", "end_date": "2026-08-31T00:00:00"}
+    before = client.get("/api/events", params=params).json()
+
+    exported = client.get("/api/export/ics")
+    assert exported.headers["content-type"].startswith("text/calendar")
+    assert all(len(line.encode()) <= 75 for line in exported.text.split("\r\n"))
+    asyncio.run(db.events.delete_many({}))
+    assert client.post("/api/import/ics", content=exported.content).json()["imported"] == 2
+
+    after = client.get("/api/events", params=params).json()
+    fields = ("title", "start_date", "end_date", "all_day", "original_start_date")
+    assert [tuple(o[f] for f in fields) for o in after] == [tuple(o[f] for f in fields) for o in before]
+
+
+def test_count_rules_store_last_occurrence_and_drop_out_of_range_queries(client, db):
+    import asyncio
+    import server
+
+    ten = client.post("/api/events", json=event_payload(
+        "ten sessions", datetime(2024, 1, 1, 18), datetime(2024, 1, 1, 19),
+        {"type": "weekly", "interval": 1, "count": 10})).json()
+    assert ten["recurrence"]["last_occurrence"] == "2024-03-04T18:00:00"
+    last_friday = client.post("/api/events", json=event_payload(
+        "last friday", datetime(2024, 1, 1, 17), None,
+        {"type": "monthly", "interval": 1, "days_of_week": [4], "by_set_pos": [-1]})).json()
+
+    def matching(start, end):
+        query = server.range_query(start, end)
+        return sorted(e["title"] for e in asyncio.run(db.events.find(query).to_list(None)))
+
+    assert matching("2024-02-01T00:00:00", "2024-02-29T23:59:59") == ["last friday", "ten sessions"]
+    assert matching("2026-05-01T00:00:00", "2026-05-31T23:59:59") == ["last friday"]
+    may = client.get("/api/events", params={"start_date": "2026-05-01T00:00:00", "end_date": "2026-05-31T23:59:59"})
+    assert [e["start_date"] for e in may.json()] == ["2026-05-29T17:00:00"]
+
+    # Moving the series start moves its last occurrence, even without the rule in the update
+    client.put(f"/api/events/{ten['_id']}", json={"start_date": "2026-05-04T18:00:00", "end_date": "2026-05-04T19:00:00"})
+    assert client.get(f"/api/events/{ten['_id']}").json()["recurrence"]["last_occurrence"] == "2026-07-06T18:00:00"
+    assert matching("2026-05-01T00:00:00", "2026-05-31T23:59:59") == ["last friday", "ten sessions"]
+
+    bad = client.put(f"/api/events/{last_friday['_id']}", json={"recurrence": {"type": "monthly", "by_month_day": [40]}})
+    assert bad.status_code == 400
+
+
+def test_non_positive_intervals_are_rejected_everywhere(client, db):
+    import asyncio
+
+    for interval in (0, -1):
+        rule = {"type": "daily", "interval": interval}
+        assert client.post("/api/events", json=event_payload("bad", datetime(2024, 3, 1, 9), None, rule)).status_code == 422
+        assert client.post("/api/events/bulk", json=[event_payload("bad", datetime(2024, 3, 1, 9), None, rule)]).status_code == 422
+    calendar = "\r\n".join(["BEGIN:VCALENDAR", "BEGIN:VEVENT", "UID:zero@example.com", "DTSTART:20240301T090000",
+                             "RRULE:FREQ=DAILY;INTERVAL=0", "SUMMARY:bad", "END:VEVENT", "END:VCALENDAR"])
+    summary = client.post("/api/import/ics", content=calendar.encode()).json()
+    assert (summary["imported"], summary["skipped"]) == (0, 1)
+    assert asyncio.run(db.events.count_documents({})) == 0
+
+    # One stored before the check reads as a single event instead of failing the whole range
+    stored = dict(event_payload("legacy", datetime(2024, 3, 1, 9), None, {"type": "daily", "interval": 0}),
+                  effective_start="2024-03-01T09:00:00", effective_end="9999-12-31T23:59:59")
+    asyncio.run(db.events.insert_one(stored))
+    response = client.get("/api/events", params={"start_date": "2024-03-01T00:00:00", "end_date": "2024-03-31T00:00:00"})
+    assert titles(response) == ["legacy"]
+
+
+def test_weekdays_of_monthly_rules_need_a_month_day_or_set_position(client):
+    # Stored before monthly rules read by-rules: the weekdays never applied and still don't
+    monthly = client.post("/api/events", json=event_payload(
+        "first of the month", datetime(2024, 1, 1, 9), None,
+        {"type": "monthly", "interval": 1, "days_of_week": [4]})).json()
+    params = {"start_date": "2024-01-01T00:00:00", "end_date": "2024-03-31T23:59:59"}
+    assert [e["start_date"] for e in client.get("/api/events", params=params).json()] == [
+        "2024-01-01T09:00:00", "2024-02-01T09:00:00", "2024-03-01T09:00:00"]
+    assert "BYDAY" not in client.get("/api/export/ics").text
+
+    client.delete(f"/api/events/{monthly['_id']}")
+    calendar = "\r\n".join(["BEGIN:VCALENDAR", "BEGIN:VEVENT", "UID:mondays@example.com", "DTSTART:20240101T090000",
+                             "RRULE:FREQ=MONTHLY;BYDAY=MO", "SUMMARY:mondays", "END:VEVENT", "END:VCALENDAR"])
+    summary = client.post("/api/import/ics", content=calendar.encode()).json()
+    assert summary["imported"] == 1 and any("ignored RRULE parts BYDAY=MO" in w for w in summary["warnings"])
+
+
+def test_derived_field_refresh_moves_updated_at_with_it(client, db, monkeypatch):
+    import asyncio
+    import server
+
+    series = client.post("/api/events", json=event_payload(
+        "sessions", datetime(2024, 1, 1, 18), datetime(2024, 1, 1, 19), {"type": "weekly", "interval": 1})).json()
+    refresh, first_write = server.refresh_derived_fields, []
+
+    async def recording_refresh(events, *args, **kwargs):
+        first_write.extend((e["updated_at"], e["recurrence"]["last_occurrence"]) for e in events)
+        await refresh(events, *args, **kwargs)
+
+    monkeypatch.setattr(server, "refresh_derived_fields", recording_refresh)
+    updated = client.put(f"/api/events/{series['_id']}", json={"recurrence": {"type": "weekly", "interval": 1, "count": 3}}).json()
+    stored = asyncio.run(db.events.find_one({"_id": server.ObjectId(series["_id"])}))
+
+    # What a reader could have seen between the two writes has its own updated_at, and so its own ETag
+    [(stamp, last_occurrence)] = first_write
+    assert last_occurrence is None and stamp < stored["updated_at"] == updated["updated_at"]
+    assert updated["recurrence"]["last_occurrence"] == stored["recurrence"]["last_occurrence"] == "2024-01-15T18:00:00"
+
+
+def test_count_and_end_date_are_exclusive(client):
+    rule = {"type": "daily", "interval": 1, "count": 5, "end_date": "2024-03-10T09:00:00"}
+    assert client.post("/api/events", json=event_payload("both", datetime(2024, 3, 1, 9), None, rule)).status_code == 400
+    calendar = "\r\n".join(["BEGIN:VCALENDAR", "BEGIN:VEVENT", "UID:both@example.com", "DTSTART:20240301T090000",
+                             "RRULE:FREQ=DAILY;COUNT=5;UNTIL=20240310T090000", "SUMMARY:both", "END:VEVENT",
+                             "END:VCALENDAR"])
+    assert client.post("/api/import/ics", content=calendar.encode()).json()["skipped"] == 1
+
+
+def test_all_day_events_stay_in_windows_starting_later_that_day(client):
+    client.post("/api/events", json=dict(event_payload("holiday", datetime(2024, 3, 10)), all_day=True))
+    client.post("/api/events", json=dict(event_payload(
+        "weekly day off", datetime(2024, 2, 4), None,
+        {"type": "weekly", "interval": 1, "end_date": "2024-03-10T00:00:00"}), all_day=True))
+    params = {"start_date": "2024-03-10T12:00:00", "end_date": "2024-03-10T18:00:00"}
+
+    assert titles(client.get("/api/events", params=params)) == ["holiday", "weekly day off"]
+    busy = client.get("/api/freebusy", params=params).json()["busy"]
+    assert [(b["start"], b["end"]) for b in busy] == [("2024-03-10T12:00:00", "2024-03-10T18:00:00")]
+    assert titles(client.get("/api/events", params={
+        "start_date": "2024-03-11T00:00:00", "end_date": "2024-03-11T23:59:59"})) == []
+
+
+def test_effective_end_excludes_finished_series_in_the_query(client, db):
+    import asyncio
+    import server
+
+    def stored_end(event_id):
+        from bson import ObjectId
+        return asyncio.run(db.events.find_one({"_id": ObjectId(event_id)}))["effective_end"]
+
+    def matching(start, end):
+        query = server.range_query(start, end)
+        return sorted(e["title"] for e in asyncio.run(db.events.find(query).to_list(None)))
+
+    # The last occurrence starts before the window but runs into it
+    overnight = client.post("/api/events", json=event_payload(
+        "overnight", datetime(2024, 1, 1, 22), datetime(2024, 1, 2, 6),
+        {"type": "daily", "interval": 1, "end_date": "2024-01-31T22:00:00"})).json()
+    assert stored_end(overnight["_id"]) == "2024-02-01T06:00:00"
+    open_series = client.post("/api/events", json=event_payload(
+        "open", datetime(2024, 1, 1, 9), None, {"type": "weekly", "interval": 1})).json()
+    assert stored_end(open_series["_id"]) == server.OPEN_ENDED
+    assert matching("2024-02-01T00:00:00", "2024-02-01T23:59:59") == ["open", "overnight"]
+    assert matching("2024-02-02T00:00:00", "2024-02-02T23:59:59") == ["open"]
+
+    # Moving the final instance past the series end keeps the series in range
+    client.put(f"/api/events/{overnight['_id']}/occurrences/2024-01-31T22:00:00",
+               json={"start_date": "2024-02-03T22:00:00", "end_date": "2024-02-04T06:00:00"})
+    assert stored_end(overnight["_id"]) == "2024-02-04T06:00:00"
+    assert matching("2024-02-04T00:00:00", "2024-02-04T23:59:59") == ["open", "overnight"]
+    client.delete(f"/api/events/{overnight['_id']}/occurrences/2024-01-31T22:00:00")
+    assert stored_end(overnight["_id"]) == "2024-02-01T06:00:00"
+
+    # Updating only the end date changes the duration and with it the effective end
+    client.put(f"/api/events/{overnight['_id']}", json={"end_date": "2024-01-01T23:00:00"})
+    assert stored_end(overnight["_id"]) == "2024-01-31T23:00:00"
+
+    # Documents from before the field existed are backfilled on startup
+    asyncio.run(db.events.insert_one(event_payload(
+        "legacy", datetime(2020, 1, 1, 9), None, {"type": "daily", "interval": 1, "end_date": "2020-12-31"})))
+    assert matching("2020-06-01T00:00:00", "2020-06-30T23:59:59") == []
+    asyncio.run(server.backfill_effective_range())
+    assert matching("2020-06-01T00:00:00", "2020-06-30T23:59:59") == ["legacy"]
+
+
+def test_zoned_series_keep_local_time_across_dst(client, db):
+    import asyncio
+    from urllib.parse import quote
+
+    unknown = dict(event_payload("bad", datetime(2026, 3, 1, 9)), tzid="Mars/Olympus_Mons")
+    assert client.post("/api/events", json=unknown).status_code == 422
+
+    # Sent in UTC like the app does: 09:00 in Berlin, the week clocks go forward
+    series = client.post("/api/events", json=dict(
+        event_payload("standup", datetime(2026, 3, 23), None, {"type": "daily", "interval": 1, "count": 10}),
+        start_date="2026-03-23T08:00:00Z", end_date="2026-03-23T08:15:00Z", tzid="Europe/Berlin")).json()
+    assert series["recurrence"]["last_occurrence"] == "2026-04-01T09:00:00"
+    params = {"start_date": "2026-03-27T00:00:00Z", "end_date": "2026-03-31T00:00:00Z"}
+    assert [(o["start_date"], o["end_date"]) for o in client.get("/api/events", params=params).json()] == [
+        ("2026-03-27T09:00:00+01:00", "2026-03-27T09:15:00+01:00"),
+        ("2026-03-28T09:00:00+01:00", "2026-03-28T09:15:00+01:00"),
+        ("2026-03-29T09:00:00+02:00", "2026-03-29T09:15:00+02:00"),
+        ("2026-03-30T09:00:00+02:00", "2026-03-30T09:15:00+02:00"),
+    ]
+    stored = asyncio.run(db.events.find_one({}))
+    assert stored["effective_end"] == "2026-04-01T07:15:00"
+
+    # Occurrences are addressed by their offset start or by their wall-clock time
+    url = f"/api/events/{series['_id']}/occurrences"
+    assert client.put(f"{url}/{quote('2026-03-30T09:00:00+02:00')}", json={"title": "moved"}).status_code == 200
+    assert client.delete(f"{url}/2026-03-29T09:00:00").status_code == 200
+    assert client.put(f"{url}/{quote('2026-03-30T09:00:00+01:00')}", json={"title": "x"}).status_code == 404
+    before = client.get("/api/events", params=params).json()
+    assert [(o["title"], o["start_date"], o["original_start_date"]) for o in before] == [
+        ("standup", "2026-03-27T09:00:00+01:00", None),
+        ("standup", "2026-03-28T09:00:00+01:00", None),
+        ("moved", "2026-03-30T09:00:00+02:00", "2026-03-30T09:00:00"),
+    ]
+
+    exported = client.get("/api/export/ics").text
+    assert "DTSTART;TZID=Europe/Berlin:20260323T090000" in exported
+    assert "EXDATE;TZID=Europe/Berlin:20260329T090000" in exported
+    assert "RECURRENCE-ID;TZID=Europe/Berlin:20260330T090000" in exported
+    asyncio.run(db.events.delete_many({}))
+    assert client.post("/api/import/ics", content=exported.encode()).json()["imported"] == 1
+    after = client.get("/api/events", params=params).json()
+    fields = ("title", "start_date", "end_date", "original_start_date", "tzid")
+    assert [tuple(o[f] for f in fields) for o in after] == [tuple(o[f] for f in fields) for o in before]
+
+
+def test_zoned_events_with_wall_clock_starts_are_found_by_utc_windows(client, db):
+    import asyncio
+    import server
+
+    # 08:00 on the 11th in Tokyo is 23:00 UTC on the 10th
+    calendar = "\r\n".join(["BEGIN:VCALENDAR", "VERSION:2.0", "BEGIN:VEVENT", "UID:tokyo@example.com",
+                            "DTSTART;TZID=Asia/Tokyo:20300311T080000", "DTEND;TZID=Asia/Tokyo:20300311T090000",
+                            "SUMMARY:imported", "END:VEVENT", "END:VCALENDAR"])
+    assert client.post("/api/import/ics", content=calendar.encode()).json()["imported"] == 1
+    client.post("/api/events", json=dict(event_payload(
+        "created", datetime(2030, 3, 11, 8, 30), datetime(2030, 3, 11, 8, 45)), tzid="Asia/Tokyo"))
+    client.post("/api/events", json=event_payload(
+        "utc", datetime(2030, 3, 10, 23, tzinfo=timezone.utc), datetime(2030, 3, 10, 23, 10, tzinfo=timezone.utc)))
+
+    params = {"start_date": "2030-03-10T00:00:00Z", "end_date": "2030-03-10T23:59:00Z"}
+    assert titles(client.get("/api/events", params=params)) == ["created", "imported", "utc"]
+    busy = client.get("/api/freebusy", params=params).json()["busy"]
+    assert [(b["start"], b["end"]) for b in busy] == [("2030-03-10T23:00:00", "2030-03-10T23:59:00")]
+    assert titles(client.get("/api/events", params={
+        "start_date": "2030-03-11T00:00:00Z", "end_date": "2030-03-11T23:59:00Z"})) == ["imported"]
+
+    # Documents stored before effective_start existed are found once backfilled
+    asyncio.run(db.events.update_many({}, {"$unset": {"effective_start": ""}}))
+    assert titles(client.get("/api/events", params=params)) == []
+    asyncio.run(server.backfill_effective_range())
+    assert titles(client.get("/api/events", params=params)) == ["created", "imported", "utc"]
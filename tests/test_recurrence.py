@@ -0,0 +1,397 @@
+from datetime import datetime, timedelta
+
+import pytest
+from dateutil.rrule import rrule, DAILY, WEEKLY, MONTHLY, YEARLY
+
+from server import expand_recurring_events, seek_recurrence_start
+
+
+def make_event(start, recurrence, duration=timedelta(hours=1)):
+    return {
+        "_id": "series-1",
+        "title": "Series",
+        "start_date": start.isoformat(),
+        "end_date": (start + duration).isoformat(),
+        "event_type": "meeting",
+        "color": "#C7B8EA",
+        "icon": "briefcase",
+        "recurrence": recurrence,
+    }
+
+
+def full_walk(freq, start, interval, window_start, window_end, byweekday=None):
+    """Reference expansion: walk the rule from the series start like the original code."""
+    params = {"freq": freq, "dtstart": start, "interval": interval, "until": window_end}
+    if byweekday:
+        params["byweekday"] = byweekday
+    return [d for d in rrule(**params) if window_start <= d <= window_end]
+
+
+@pytest.mark.parametrize("rule_type,freq,interval,days_of_week,start", [
+    ("daily", DAILY, 1, None, datetime(2021, 3, 4, 9, 30)),
+    ("daily", DAILY, 3, None, datetime(2021, 3, 4, 9, 30)),
+    ("weekly", WEEKLY, 1, None, datetime(2021, 3, 4, 9, 30)),
+    ("weekly", WEEKLY, 2, [0, 2, 4], datetime(2021, 3, 4, 9, 30)),
+    ("monthly", MONTHLY, 1, None, datetime(2021, 1, 31, 18, 0)),
+    ("monthly", MONTHLY, 5, None, datetime(2021, 1, 30, 18, 0)),
+    ("yearly", YEARLY, 1, None, datetime(2020, 2, 29, 8, 0)),
+    ("yearly", YEARLY, 3, None, datetime(2019, 7, 14, 8, 0)),
+])
+def test_windowed_expansion_matches_full_walk(rule_type, freq, interval, days_of_week, start):
+    recurrence = {"type": rule_type, "interval": interval, "days_of_week": days_of_week}
+    event = make_event(start, recurrence)
+    for offset_days in (0, 1, 17, 200, 731, 1500):
+        window_start = start + timedelta(days=offset_days, hours=5)
+        window_end = window_start + timedelta(days=400)
+        expected = full_walk(freq, start, interval, window_start, window_end, days_of_week)
+        got = [datetime.fromisoformat(e["start_date"]) for e in expand_recurring_events(event, window_start, window_end)]
+        assert got == expected
+
+
+def test_seek_never_passes_window_start():
+    start = datetime(2020, 1, 31, 12, 0)
+    for freq in (DAILY, WEEKLY, MONTHLY, YEARLY):
+        for days in range(0, 1500, 37):
+            window_start = start + timedelta(days=days)
+            seeked = seek_recurrence_start(freq, start, 2, window_start)
+            assert start <= seeked <= window_start
+
+
+def test_recurrence_end_date_still_respected():
+    start = datetime(2022, 1, 1, 10, 0)
+    event = make_event(start, {"type": "daily", "interval": 1, "end_date": "2022-01-10T10:00:00"})
+    occurrences = expand_recurring_events(event, datetime(2022, 1, 8), datetime(2022, 2, 1))
+    assert [o["start_date"] for o in occurrences] == [
+        "2022-01-08T10:00:00", "2022-01-09T10:00:00", "2022-01-10T10:00:00",
+    ]
+    assert occurrences[0]["is_recurring_instance"] is False
+    assert all(o["is_recurring_instance"] for o in occurrences[1:])
+
+
+def test_occurrence_cache_evicts_least_recently_used_within_budget():
+    from server import OccurrenceCache
+
+    event = make_event(datetime(2026, 1, 1, 9), {"type": "daily", "interval": 1})
+    windows = [(datetime(2026, month, 1), datetime(2026, month, 28)) for month in (1, 2, 3)]
+    probe = OccurrenceCache(max_bytes=10 ** 9)
+    probe.get_or_expand(event, *windows[0])
+    cache = OccurrenceCache(max_bytes=int(probe.current_bytes * 2.5))
+
+    cache.get_or_expand(event, *windows[0])
+    cache.get_or_expand(event, *windows[1])
+    cache.get_or_expand(event, *windows[0])  # refresh, so windows[1] is now the oldest
+    cache.get_or_expand(event, *windows[2])
+    assert cache.stats()["evictions"] == 1
+    assert cache.current_bytes <= cache.max_bytes
+
+    cache.get_or_expand(event, *windows[0])
+    cache.get_or_expand(event, *windows[1])
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_interval_tree_matches_brute_force_under_inserts_and_removes():
+    import random
+    from server import IntervalTree
+
+    rng = random.Random(7)
+    base = datetime(2026, 1, 1)
+
+    def random_interval(i):
+        start = base + timedelta(minutes=rng.randrange(0, 20000))
+        return start, start + timedelta(minutes=rng.randrange(1, 600)), f"s{i % 40}"
+
+    intervals = {random_interval(i) for i in range(400)}
+    tree = IntervalTree.build(list(intervals))
+    for i in range(400, 600):
+        interval = random_interval(i)
+        tree.insert(*interval)
+        intervals.add(interval)
+    for interval in rng.sample(sorted(intervals), 200):
+        tree.remove(*interval)
+        intervals.discard(interval)
+    assert tree.size == len(intervals)
+
+    for _ in range(200):
+        start = base + timedelta(minutes=rng.randrange(-100, 21000))
+        end = start + timedelta(minutes=rng.randrange(1, 300))
+        expected = sorted(i for i in intervals if i[0] < end and i[1] > start)
+        assert tree.overlapping(start, end) == expected
+    moment = base + timedelta(minutes=5000)
+    assert tree.at(moment) == sorted(i for i in intervals if i[0] <= moment < i[1])
+
+
+def test_reminder_scheduler_fires_in_order_across_horizon_chunks():
+    from bson import ObjectId
+    from server import ReminderScheduler
+
+    now = datetime(2026, 3, 1)
+    standup = dict(make_event(datetime(2026, 1, 1, 9), {"type": "daily", "interval": 1}),
+                   _id=ObjectId(), title="standup", reminders=[{"minutes_before": 10}, {"minutes_before": 3 * 24 * 60}])
+    launch = dict(make_event(datetime(2026, 3, 9, 15), None), _id=ObjectId(), title="launch", reminders=[{"minutes_before": 60}])
+    scheduler = ReminderScheduler(sink=None, horizon_days=2)
+    scheduler.schedule(standup, now=now)
+    scheduler.schedule(launch, now=now)
+
+    fired = []
+    for hour in range(1, 24 * 10 + 1):
+        due = scheduler.pop_due(now + timedelta(hours=hour))
+        assert all(r["fire_at"] <= (now + timedelta(hours=hour)).isoformat() for r in due)
+        fired.extend((r["fire_at"], r["title"], r["minutes_before"]) for r in due)
+        assert len(scheduler._heap) <= 2 * len(scheduler._series) + 1024
+
+    end = now + timedelta(days=10)
+    expected = [((datetime(2026, 3, 9, 14)).isoformat(), "launch", 60)]
+    for day in range(80):
+        start = datetime(2026, 1, 1, 9) + timedelta(days=day)
+        for lead in (10, 3 * 24 * 60):
+            if now <= start - timedelta(minutes=lead) <= end:
+                expected.append(((start - timedelta(minutes=lead)).isoformat(), "standup", lead))
+    assert fired == sorted(expected)
+
+
+def test_reminder_scheduler_reschedules_and_unschedules():
+    from bson import ObjectId
+    from server import ReminderScheduler
+
+    now = datetime(2026, 3, 1)
+    event = dict(make_event(datetime(2026, 3, 2, 9), None), _id=ObjectId(), reminders=[{"minutes_before": 30}])
+    scheduler = ReminderScheduler(sink=None, horizon_days=30)
+    scheduler.schedule(event, now=now)
+    scheduler.schedule(dict(event, start_date=datetime(2026, 3, 3, 9).isoformat()), now=now)
+    assert scheduler.pop_due(datetime(2026, 3, 2, 12)) == []
+    assert [r["occurrence_start"] for r in scheduler.pop_due(datetime(2026, 3, 3, 12))] == ["2026-03-03T09:00:00"]
+
+    scheduler.schedule(dict(event, start_date=datetime(2026, 3, 5, 9).isoformat()), now=now)
+    scheduler.unschedule(str(event["_id"]))
+    assert scheduler.pop_due(datetime(2026, 3, 6)) == [] and scheduler.next_due() is None
+
+
+def test_slow_reminder_delivery_does_not_hold_up_the_rest():
+    import asyncio
+    from bson import ObjectId
+    from server import ReminderScheduler
+
+    class StallingSink:
+        def __init__(self):
+            self.delivered, self.release = [], asyncio.Event()
+
+        async def deliver(self, reminder):
+            if reminder["title"] == "slow":
+                await self.release.wait()
+            self.delivered.append(reminder["title"])
+
+    async def scenario():
+        now = datetime.utcnow()
+        sink = StallingSink()
+        scheduler = ReminderScheduler(sink, horizon_days=1, max_concurrent_deliveries=2)
+        for title in ("slow", "fast", "also fast"):
+            event = dict(make_event(now + timedelta(minutes=10), None), _id=ObjectId(), title=title,
+                         reminders=[{"minutes_before": 10}])
+            scheduler.schedule(event, now=now - timedelta(minutes=1))
+        run = asyncio.create_task(scheduler.run(max_sleep=0.01))
+        await asyncio.sleep(0.1)
+        assert sink.delivered == ["fast", "also fast"] and scheduler.stats()["delivering"] == 1
+        sink.release.set()
+        await asyncio.sleep(0.05)
+        run.cancel()
+        return sink.delivered
+
+    assert asyncio.run(scenario()) == ["fast", "also fast", "slow"]
+
+
+def test_webhook_sink_reuses_one_client_and_retries_server_errors():
+    import asyncio
+    import httpx
+    from server import WebhookReminderSink
+
+    statuses = iter([503, 200, 200])
+
+    def handler(request):
+        return httpx.Response(next(statuses))
+
+    sink = WebhookReminderSink("http://hooks.local/reminders", max_attempts=2, transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        client = sink._http
+        await sink.deliver({"event_id": "a"})
+        await sink.deliver({"event_id": "b"})
+        assert sink._http is client
+        await sink.close()
+        return client.is_closed
+
+    assert asyncio.run(scenario())
+    assert next(statuses, None) is None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorized_starts_match_rrule(seed):
+    import random
+    from datetime import timezone
+    from server import fixed_recurrence_step, recurrence_starts
+
+    rng = random.Random(seed)
+    zones = [None, timezone.utc, timezone(timedelta(hours=5, minutes=30)), timezone(timedelta(hours=-8))]
+    for _ in range(200):
+        tz = rng.choice(zones)
+        dtstart = datetime(2020, 1, 1, tzinfo=tz) + timedelta(
+            days=rng.randrange(0, 2000), seconds=rng.randrange(0, 86400), microseconds=rng.randrange(0, 10 ** 6))
+        window_start = dtstart + timedelta(days=rng.randrange(-30, 400), seconds=rng.randrange(-86400, 86400))
+        window_end = window_start + timedelta(days=rng.randrange(0, 500), seconds=rng.randrange(0, 86400))
+        until = rng.choice([window_end, window_end - timedelta(days=rng.randrange(0, 600))])
+        params = {"freq": rng.choice([DAILY, WEEKLY]), "dtstart": dtstart,
+                  "interval": rng.randrange(1, 6), "until": until}
+
+        assert fixed_recurrence_step(params) is not None
+        expected = [d for d in rrule(**params) if window_start <= d <= window_end]
+        got = list(recurrence_starts(dict(params), window_start, window_end))
+        assert got == expected
+        assert all(d.tzinfo == dtstart.tzinfo for d in got)
+
+
+@pytest.mark.parametrize("recurrence,by_parts", [
+    ({"type": "monthly", "interval": 1, "days_of_week": [4], "by_set_pos": [-1]}, {"byweekday": [4], "bysetpos": [-1]}),
+    ({"type": "monthly", "interval": 2, "by_month_day": [-1, 15]}, {"bymonthday": [-1, 15]}),
+    ({"type": "yearly", "interval": 1, "days_of_week": [0], "by_set_pos": [2]}, {"byweekday": [0], "bysetpos": [2]}),
+    ({"type": "weekly", "interval": 1, "days_of_week": [0, 2, 4], "count": 40}, {"byweekday": [0, 2, 4], "count": 40}),
+    ({"type": "monthly", "interval": 1, "by_month_day": [31], "count": 12}, {"bymonthday": [31], "count": 12}),
+    ({"type": "daily", "interval": 3, "count": 100}, {"count": 100}),
+])
+def test_count_and_by_rules_expand_windowed_like_a_full_walk(recurrence, by_parts):
+    from server import RECURRENCE_FREQUENCIES, checked_recurrence
+
+    start = datetime(2021, 1, 29, 18, 30)
+    event = make_event(start, checked_recurrence(recurrence, start))
+    reference = list(rrule(freq=RECURRENCE_FREQUENCIES[recurrence["type"]], dtstart=start,
+                           interval=recurrence["interval"], **by_parts, **({} if "count" in by_parts else {"count": 200})))
+    if "count" in by_parts:
+        assert event["recurrence"]["last_occurrence"] == reference[-1].isoformat()
+    for offset_days in (0, 45, 200, 400, 1200):
+        window_start = start + timedelta(days=offset_days, hours=3)
+        window_end = window_start + timedelta(days=90)
+        expected = [d for d in reference if window_start <= d <= window_end]
+        got = [datetime.fromisoformat(e["start_date"]) for e in expand_recurring_events(event, window_start, window_end)]
+        assert got == expected
+
+
+def test_moved_instances_are_bisected_from_an_index_rebuilt_per_version():
+    import random
+    from server import iter_occurrences
+
+    rng = random.Random(7)
+    start = datetime(2020, 1, 1, 9)
+    days = [start + timedelta(days=d) for d in rng.sample(range(2000), 600)]
+    event = dict(make_event(start, {"type": "daily", "interval": 1}), updated_at="v1",
+                 exdates=[d.isoformat() for d in days[:200]],
+                 overrides={d.isoformat(): {"start_date": (d + timedelta(hours=rng.randrange(-30, 30), minutes=20)).isoformat()}
+                            for d in days[200:]})
+
+    def expected(event, window_start, window_end):
+        changed = set(event["exdates"]) | set(event["overrides"])
+        starts = [(d, "") for d in rrule(DAILY, dtstart=start, until=window_end)
+                  if d >= window_start and d.isoformat() not in changed]
+        for key, override in event["overrides"].items():
+            moved = datetime.fromisoformat(override["start_date"])
+            if window_start <= moved <= window_end and key not in event["exdates"]:
+                starts.append((moved, key))
+        return sorted(starts)
+
+    for _ in range(20):
+        window_start = start + timedelta(days=rng.randrange(0, 2000), hours=rng.randrange(24))
+        window_end = window_start + timedelta(days=rng.randrange(1, 60))
+        got = [(d, key if d.isoformat() != key else "") for d, key, _ in iter_occurrences(event, window_start, window_end)]
+        assert got == expected(event, window_start, window_end)
+
+    # A new version of the series gets a new index
+    moved_key = days[200].isoformat()
+    edited = dict(event, updated_at="v2", overrides=dict(event["overrides"], **{moved_key: {"title": "back in place"}}))
+    window = (days[200] - timedelta(days=2), days[200] + timedelta(days=2))
+    assert days[200] in [d for d, _, _ in iter_occurrences(edited, *window)]
+    assert days[200] not in [d for d, _, _ in iter_occurrences(event, *window)]
+
+
+DST_ZONES = ["Europe/Berlin", "America/New_York", "Australia/Sydney", "Australia/Lord_Howe",
+             "America/Santiago", "Asia/Kolkata", "Pacific/Chatham"]
+
+
+def reference_instant(wall, zone):
+    """zoneinfo's own reading of a wall-clock time with fold=0 (gaps move forward, repeats take the first)"""
+    from datetime import timezone
+    return wall.replace(tzinfo=zone).astimezone(timezone.utc)
+
+
+@pytest.mark.parametrize("tzid", DST_ZONES)
+def test_localized_wall_times_match_zoneinfo_around_transitions(tzid):
+    import random
+    from zoneinfo import ZoneInfo
+    from server import localize_wall_times, zone_year_transitions
+
+    zone = ZoneInfo(tzid)
+    rng = random.Random(tzid)
+    walls = []
+    for year in range(2019, 2028):
+        for moment, before, after in zone_year_transitions(tzid, year):
+            wall = moment + before  # the last reading of the old offset
+            walls.extend(wall + timedelta(minutes=m) for m in range(-90, 150, 15))
+    walls.extend(datetime(2019, 1, 1) + timedelta(seconds=rng.randrange(0, 9 * 365 * 86400)) for _ in range(500))
+    walls.sort()
+
+    localized = localize_wall_times(walls, tzid)
+    assert [d.astimezone(zone) for d in localized] == [reference_instant(w, zone).astimezone(zone) for w in walls]
+    # Existing times keep their wall-clock reading; only times in a gap move, and only forward
+    gaps = 0
+    for wall, local in zip(walls, localized):
+        exists = reference_instant(wall, zone).astimezone(zone).replace(tzinfo=None) == wall
+        assert (local.replace(tzinfo=None) == wall) == exists
+        assert local.replace(tzinfo=None) >= wall
+        gaps += not exists
+    assert gaps or tzid == "Asia/Kolkata"
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_zoned_series_keep_wall_clock_time_across_dst(seed):
+    import random
+    from datetime import timezone
+    from zoneinfo import ZoneInfo
+
+    rng = random.Random(seed)
+    for _ in range(60):
+        tzid = rng.choice(DST_ZONES)
+        zone = ZoneInfo(tzid)
+        start = datetime(2024, 1, 1) + timedelta(days=rng.randrange(0, 700), minutes=15 * rng.randrange(0, 96))
+        rule_type, freq = rng.choice([("daily", DAILY), ("weekly", WEEKLY), ("monthly", MONTHLY)])
+        interval = rng.randrange(1, 4)
+        event = dict(make_event(start, {"type": rule_type, "interval": interval}, timedelta(minutes=45)), tzid=tzid)
+        window_start = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(days=rng.randrange(0, 1000))
+        window_end = window_start + timedelta(days=rng.randrange(1, 120))
+
+        walls = rrule(freq=freq, dtstart=start, interval=interval, until=window_end.replace(tzinfo=None) + timedelta(days=1))
+        expected = [i for i in (reference_instant(w, zone) for w in walls) if window_start <= i <= window_end]
+        occurrences = expand_recurring_events(event, window_start, window_end)
+        starts = [datetime.fromisoformat(o["start_date"]) for o in occurrences]
+        assert starts == expected
+        # 45 minutes of exact time, whatever the clocks did in between
+        assert all(datetime.fromisoformat(o["end_date"]) - s == timedelta(minutes=45) for o, s in zip(occurrences, starts))
+        # Naive bounds are read as UTC
+        naive = expand_recurring_events(event, window_start.replace(tzinfo=None), window_end.replace(tzinfo=None))
+        assert [o["start_date"] for o in naive] == [o["start_date"] for o in occurrences]
+
+
+def test_a_page_of_a_zoned_series_localizes_only_what_it_reads(monkeypatch):
+    from itertools import islice
+    import server
+
+    localized = []
+    localize = server.localize_wall_times
+
+    def counting_localize(walls, tzid):
+        localized.append(len(walls))
+        return localize(walls, tzid)
+
+    monkeypatch.setattr(server, "localize_wall_times", counting_localize)
+    event = dict(make_event(datetime(2020, 1, 1, 9), {"type": "daily", "interval": 1}), tzid="Europe/Berlin")
+    for years in (1, 30):
+        localized.clear()
+        window_end = datetime(2026, 1, 1) + timedelta(days=365 * years)
+        page = list(islice(server.iter_timed_occurrences(event, datetime(2026, 1, 1), window_end), 10))
+        assert [start.day for start, _ in page] == list(range(1, 11))
+        assert sum(localized) < 64